@@ -0,0 +1,156 @@
+import hashlib
+import mimetypes
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import httpx
+
+import config
+import logs
+
+log = logs.get_logger("assets")
+
+# Voucher images (logo, tick, arrow, call, sms, background) live on S3 and never change,
+# so WeasyPrint gets them from here instead of fetching them again for every PDF.
+# Lookup order: memory -> on-disk cache -> bundled asset dir -> network.
+# Entries older than ASSET_TTL are refreshed from the network; if that fails the stale
+# copy is still served so a slow or unreachable S3 never breaks a render.
+
+_ASSET_URL_RE = re.compile(r"""https?://[^\s"'()<>]+\.(?:png|jpe?g|gif|svg|webp|css|ttf|otf|woff2?)""", re.IGNORECASE)
+
+# url -> (fetched_at, mime_type, content)
+_memory: Dict[str, Tuple[float, str, bytes]] = {}
+# url -> time of the last failed download, so an unreachable asset doesn't cost a timeout per render
+_failures: Dict[str, float] = {}
+
+
+def _disk_path(url: str) -> str:
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    extension = os.path.splitext(urlsplit(url).path)[1]
+    return os.path.join(config.ASSET_CACHE_DIR, digest + extension)
+
+
+def _guess_mime(url: str) -> str:
+    return mimetypes.guess_type(urlsplit(url).path)[0] or "application/octet-stream"
+
+
+def _read_disk(url: str) -> Optional[Tuple[float, bytes]]:
+    path = _disk_path(url)
+    try:
+        with open(path, "rb") as file:
+            return os.path.getmtime(path), file.read()
+    except OSError:
+        return None
+
+
+def _write_disk(url: str, content: bytes) -> None:
+    path = _disk_path(url)
+    try:
+        os.makedirs(config.ASSET_CACHE_DIR, exist_ok=True)
+        # Write then rename so a concurrent render worker never reads half a file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log.warning("Asset cache write failed", extra={"url": url, "error": str(e)})
+
+
+def _read_bundled(url: str) -> Optional[bytes]:
+    if not config.ASSET_BUNDLE_DIR:
+        return None
+    filename = os.path.basename(unquote(urlsplit(url).path))
+    try:
+        with open(os.path.join(config.ASSET_BUNDLE_DIR, filename), "rb") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def _download(url: str) -> Tuple[str, bytes]:
+    response = httpx.get(url, timeout=config.ASSET_FETCH_TIMEOUT, follow_redirects=True)
+    response.raise_for_status()
+    mime_type = response.headers.get("content-type", "").split(";")[0].strip()
+    return mime_type or _guess_mime(url), response.content
+
+
+def get_asset(url: str) -> Tuple[str, bytes]:
+    now = time.time()
+    cached = _memory.get(url)
+    if cached and now - cached[0] < config.ASSET_TTL:
+        return cached[1], cached[2]
+
+    stale = cached
+    if stale is None:
+        on_disk = _read_disk(url)
+        if on_disk is not None:
+            stale = (on_disk[0], _guess_mime(url), on_disk[1])
+            _memory[url] = stale
+            if now - on_disk[0] < config.ASSET_TTL:
+                return stale[1], stale[2]
+    if stale is None:
+        bundled = _read_bundled(url)
+        if bundled is not None:
+            # Bundled files are the offline source of truth; the TTL still lets S3 win later
+            stale = (now, _guess_mime(url), bundled)
+            _memory[url] = stale
+            _write_disk(url, bundled)
+            return stale[1], stale[2]
+
+    failed_at = _failures.get(url)
+    if failed_at is not None and now - failed_at < config.ASSET_RETRY_AFTER:
+        if stale is not None:
+            return stale[1], stale[2]
+        raise OSError(f"Asset {url} is unavailable, retrying after {config.ASSET_RETRY_AFTER:g}s")
+
+    try:
+        mime_type, content = _download(url)
+    except Exception as e:
+        _failures[url] = now
+        if stale is not None:
+            log.warning("Asset refresh failed, serving cached copy", extra={"url": url, "error": str(e)})
+            return stale[1], stale[2]
+        raise
+
+    _failures.pop(url, None)
+    _memory[url] = (now, mime_type, content)
+    _write_disk(url, content)
+    return mime_type, content
+
+
+# WeasyPrint url_fetcher: cached for http(s) assets, WeasyPrint's default for anything else
+def url_fetcher(url: str, timeout: int = 10, ssl_context=None) -> dict:
+    if not url.startswith(("http://", "https://")):
+        from weasyprint import default_url_fetcher
+        return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+    mime_type, content = get_asset(url)
+    return {"string": content, "mime_type": mime_type, "redirected_url": url}
+
+
+def asset_urls(html_content: str) -> List[str]:
+    return sorted(set(_ASSET_URL_RE.findall(html_content)))
+
+
+# Warm the caches for every asset referenced by the given templates.
+# Failures are reported and skipped: a missing image must not block startup.
+def preload(template_names: Iterable[str]) -> Dict[str, bool]:
+    urls = set()
+    for template_name in template_names:
+        try:
+            with open(template_name, "r") as file:
+                urls.update(asset_urls(file.read()))
+        except OSError as e:
+            log.warning("Asset preload could not read template", extra={"template": template_name, "error": str(e)})
+
+    results = {}
+    for url in sorted(urls):
+        try:
+            get_asset(url)
+            results[url] = True
+        except Exception as e:
+            log.warning("Asset preload failed", extra={"url": url, "error": str(e)})
+            results[url] = False
+    return results
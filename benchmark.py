@@ -0,0 +1,249 @@
+# Offline benchmark for the voucher pipeline.
+#
+# Times every stage of a voucher separately on synthetic bookings and writes the numbers
+# to a JSON file, so a change to the guest tables, the templating or the renderer can be
+# compared against a baseline before it is deployed:
+#
+#     python benchmark.py --output baseline.json
+#     # ... change something ...
+#     python benchmark.py --compare baseline.json
+#
+# Stages: decode (request body JSON), validation (pydantic), table (guest table),
+# fill (template placeholders), parse (WeasyPrint HTML), layout, write
+# (PDF bytes), and mail (the whole mail HTML build). Everything runs in this process, no server or render pool involved.
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+# Offline by default: an image that can't be fetched is skipped once, not retried per render
+os.environ.setdefault("ASSET_FETCH_TIMEOUT", "2")
+os.environ.setdefault("ASSET_RETRY_AFTER", "1e9")
+
+import fastjson
+import render
+from guest_table import generate_guest_table1
+from mail_routes import build_mail_html
+from models import BookingData1, BookingDataMail
+from templating import booking_variant, fill_template, template_variant
+
+PDF_STAGES = ["decode", "validation", "table", "fill", "parse", "layout", "write"]
+POLICY_TEXT = "Guests must present a valid photo ID at check-in. " * 40
+
+
+def tabledata(rows: int) -> Dict[str, list]:
+    return {
+        "GUESTNAME": [f"Guest {i}" for i in range(rows)],
+        "ROOMTYPE": ["Deluxe" if i % 2 else "Suite" for i in range(rows)],
+        "OCC": ["Double" if i % 3 else "Single" for i in range(rows)],
+        "MEALPLAN": ["CP", "MAP", "AP"] * (rows // 3) + ["CP"] * (rows % 3),
+        "CHECKIN": ["2024-01-01"] * rows,
+        "CHECKOUT": ["2024-01-03"] * rows,
+        "QTY": ["1"] * rows,
+        "NIGHTS": ["2"] * rows,
+        "INCLUSION_SERVICES": ["Breakfast"] * rows,
+    }
+
+
+def booking(rows: int, typeofbooking: Optional[str] = None, policies: str = "Standard policies apply.") -> dict:
+    payload = {
+        "NAME": "Benchmark Guest",
+        "CHECKIN": "2024-01-01",
+        "CHECKOUT": "2024-01-03",
+        "DAYOF_CHECKIN": "Monday",
+        "DAYOF_CHECKOUT11": "Wednesday",
+        "NO_OF_NIGHTS": "2",
+        "CHECK_IN_TIME": "12:00",
+        "CHECK_OUT_TIME": "11:00",
+        "HOTELNAME": "Benchmark Hotel",
+        "HOTELADDRESS": "1 Benchmark Road, Bengaluru",
+        "HOTELPHONE": "+91 80 0000 0000",
+        "ROOMCOUNT": str(rows),
+        "CLIENT": "Benchmark Corp",
+        "GUESTCOUNT": str(rows),
+        "ROOM_CHARGES": "10000",
+        "INCLUSIONS": "500",
+        "SUBTOTAL": "10500",
+        "GST_VALUE": "1260",
+        "AMT_TO_BE_PAID": "11760",
+        "PAYMENTMODE": "Bill to Company",
+        "LOCATIONLINK": "https://maps.example.com/benchmark",
+        "CANCELLATIONPOLICY": policies,
+        "ADDON_POLICES": policies,
+        "DEFAULT_POLICES": policies,
+        "EMPNAME": "Benchmark Agent",
+        "EMPPHONE": "+91 90000 00000",
+        "EMPEMAIL": "agent@example.com",
+        "TABLEDATA": tabledata(rows),
+        "SHOWTRAIFF": "Yes",
+        "CLIENT_GST": "29ABCDE1234F1Z5",
+        "FILENAME": "benchmark",
+        "Booking_Date": "2024-01-01",
+        "Booking_Id": "BM-0001",
+        "Brid": "BR-0001",
+        "GST_PRECENT": "12%",
+    }
+    # The mail model rejects an explicit null, so leave the key out instead
+    if typeofbooking:
+        payload["typeofbooking"] = typeofbooking
+    return payload
+
+
+FIXTURES = {
+    "single": booking(3),
+    "bulk_10": booking(10, "Bulk"),
+    "bulk_100": booking(100, "Bulk"),
+    "bulk_1000": booking(1000, "Bulk"),
+    "policy_heavy": booking(3, policies=POLICY_TEXT),
+}
+
+
+# One pass through the PDF pipeline; each stage reports its own duration
+def run_pdf(payload: dict, timings: Dict[str, List[float]]) -> None:
+    def timed(stage: str, fn: Callable, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage].append(time.perf_counter() - started)
+        return result
+
+    body = timed("decode", fastjson.loads, fastjson.dumps(payload))
+    data = timed("validation", lambda: BookingData1(**body))
+    table = timed("table", generate_guest_table1, data.TABLEDATA, data.typeofbooking)
+    template = template_variant("Bulkvoucher.html" if data.typeofbooking == "Bulk" else "voucher.html", booking_variant(data))
+    html_content = timed("fill", fill_template, template, data, table)
+    html = timed("parse", render._html_document, html_content)
+    document = timed("layout", render._layout, html, None)
+    timed("write", document.write_pdf)
+
+
+def run_mail(payload: dict, timings: Dict[str, List[float]]) -> None:
+    started = time.perf_counter()
+    build_mail_html(BookingDataMail(**payload))
+    timings["mail"].append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarise(values: List[float]) -> Dict[str, float]:
+    return {
+        "runs": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3),
+    }
+
+
+# Peak Python heap of one pass, measured separately because tracemalloc slows the timed runs.
+# WeasyPrint's native allocations (Pango, HarfBuzz) are not included.
+def peak_memory(run: Callable, payload: dict, stages: List[str]) -> int:
+    tracemalloc.start()
+    try:
+        run(payload, {stage: [] for stage in stages})
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(payload: dict, iterations: int, warmup: int, pdf: bool) -> Dict:
+    results = {}
+    suites = [("mail", run_mail, ["mail"])]
+    if pdf:
+        suites.insert(0, ("pdf", run_pdf, PDF_STAGES))
+    for suite, run, stages in suites:
+        timings = {stage: [] for stage in stages}
+        for _ in range(warmup):
+            run(payload, {stage: [] for stage in stages})
+        for _ in range(iterations):
+            run(payload, timings)
+        peak = peak_memory(run, payload, stages)
+        results[suite] = {
+            "stages": {stage: summarise(values) for stage, values in timings.items()},
+            "total": summarise([sum(parts) for parts in zip(*timings.values())]),
+            "peak_python_bytes": peak,
+        }
+    return results
+
+
+# Stage/fixture pairs whose p50 grew by more than the threshold factor. Sub-millisecond
+# stages jitter by more than 20% between runs, so growth below min_delta_ms is ignored.
+def regressions(baseline: Dict, current: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    found = []
+    for fixture, suites in current["fixtures"].items():
+        for suite, result in suites.items():
+            before = baseline.get("fixtures", {}).get(fixture, {}).get(suite)
+            if before is None:
+                continue
+            for stage, summary in dict(result["stages"], total=result["total"]).items():
+                old = before["total"] if stage == "total" else before["stages"].get(stage)
+                if old is None:
+                    continue
+                grown = summary["p50_ms"] - old["p50_ms"]
+                if summary["p50_ms"] > old["p50_ms"] * threshold and grown > min_delta_ms:
+                    found.append(
+                        f"{fixture}/{suite}/{stage}: p50 {old['p50_ms']}ms -> {summary['p50_ms']}ms"
+                    )
+    return found
+
+
+def print_report(report: Dict) -> None:
+    for fixture, suites in report["fixtures"].items():
+        for suite, result in suites.items():
+            print(f"{fixture} [{suite}]  peak python heap {result['peak_python_bytes'] / 1024:.0f} KiB")
+            for stage, summary in dict(result["stages"], total=result["total"]).items():
+                print(
+                    f"  {stage:<10} p50 {summary['p50_ms']:>9.3f}ms  p95 {summary['p95_ms']:>9.3f}ms"
+                    f"  p99 {summary['p99_ms']:>9.3f}ms"
+                )
+    print(f"max RSS {report['max_rss_kib']} KiB")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the voucher render pipeline")
+    parser.add_argument("--iterations", type=int, default=20, help="timed runs per fixture")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per fixture before timing")
+    parser.add_argument("--fixtures", nargs="*", choices=sorted(FIXTURES), help="fixtures to run (default: all)")
+    parser.add_argument("--no-pdf", action="store_true", help="skip WeasyPrint stages (HTML builders only)")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON; exit 1 if a stage's p50 regressed")
+    parser.add_argument("--threshold", type=float, default=1.2, help="allowed p50 growth factor for --compare")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore p50 growth smaller than this")
+    args = parser.parse_args()
+
+    report = {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "render_version": render.RENDER_VERSION,
+        "fixtures": {},
+    }
+    for name in args.fixtures or FIXTURES:
+        report["fixtures"][name] = benchmark(FIXTURES[name], args.iterations, args.warmup, not args.no_pdf)
+    # ru_maxrss is KiB on Linux (bytes on macOS); includes WeasyPrint's native memory
+    report["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print_report(report)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            found = regressions(json.load(file), report, args.threshold, args.min_delta_ms)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+import metrics
+
+
+class LRUByteCache:
+    # Least-recently-used cache bounded by the total size of its values, not their count.
+    # Values are bytes unless a sizeof function says how big something else is.
+    # Only touched from the event loop, so it needs no locking. A named cache reports its
+    # lookups as cache_requests_total{cache=name}.
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = len, name: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            if self.name:
+                metrics.CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if self.name:
+            metrics.CACHE_REQUESTS.inc(cache=self.name, result="hit")
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= self.sizeof(previous)
+        self._entries[key] = value
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+# Caches reported by the cache_size_bytes gauge, registered by the module that owns each one
+_sized_caches: Dict[str, LRUByteCache] = {}
+
+
+def report_size(name: str, cache: LRUByteCache) -> None:
+    _sized_caches[name] = cache
+
+
+metrics.Callback(
+    "cache_size_bytes", "Bytes held by each in-memory cache", "gauge",
+    lambda: {(name,): cache.size for name, cache in _sized_caches.items()}, ["cache"],
+)
+
+
+class SingleFlight:
+    # Coalesces concurrent calls for the same key: the first caller runs the work, everyone
+    # arriving while it is in flight awaits the same result (or exception).
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._flights
+
+    def start(self, key: str, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._flights.pop(key, None)
+        # Mark the exception retrieved; whoever awaited the task has already received it
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # shield: one caller giving up (client disconnect) must not cancel the others' result
+        return await asyncio.shield(self.start(key, fn))
+
+
+# Stable hash of a validated model (or any JSON-able value): key order and spacing don't matter
+def canonical_hash(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = json.dumps(jsonable_encoder(part), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        digest.update(encoded.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# True when an If-None-Match header value matches the given (quoted) ETag
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,156 @@
+import zlib
+from typing import List, Optional, Tuple
+
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content-negotiated gzip / brotli for text responses (mail HTML, JSON, NDJSON).
+# Responses that already carry a Content-Encoding (proxied gzip passed through untouched),
+# binary types (PDF, ZIP) and bodies below COMPRESSION_MIN_SIZE are left alone.
+# Streaming responses are compressed chunk by chunk and flushed per chunk, so NDJSON lines
+# still reach the client as soon as they are produced.
+
+_COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+
+# (coding, q-value) per Accept-Encoding entry; an unreadable q-value counts as q=0
+def _codings(accept_encoding: str) -> List[Tuple[str, float]]:
+    codings = []
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings.append((coding.strip().lower(), quality))
+    return codings
+
+
+# Whether the client takes `coding`: its own entry decides, else "*"; q=0 refuses either way
+def accepts(accept_encoding: str, coding: str) -> bool:
+    wildcard = False
+    for name, quality in _codings(accept_encoding):
+        if name == coding:
+            return quality > 0
+        if name == "*":
+            wildcard = quality > 0
+    return wildcard
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    # br only when named: "*" alone keeps getting gzip, which every client decodes
+    if brotli is not None and dict(_codings(accept_encoding)).get("br", 0) > 0:
+        return "br"
+    if accepts(accept_encoding, "gzip"):
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    # Same interface for both codings: compress() for a chunk, finish() for the tail
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=config.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits 31: zlib writes the gzip header and trailer itself
+            self._zlib = zlib.compressobj(config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.flush() if flush else b"")
+        return self._zlib.compress(data) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+def _compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+    content_type = b""
+    for name, value in headers:
+        if name == b"content-encoding":
+            return False
+        if name == b"content-type":
+            content_type = value
+    return content_type.decode("latin-1").lower().startswith(_COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether compressing is worth it
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = list(start_message["headers"])
+                small = not more_body and len(body) < self.minimum_size
+                if small or start_message["status"] in (204, 304) or not _compressible(headers):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers = [(name, value) for name, value in headers if name not in (b"content-length", b"vary")]
+                vary = [value for name, value in start_message["headers"] if name == b"vary"]
+                if not any(b"accept-encoding" in value.lower() for value in vary):
+                    vary.append(b"Accept-Encoding")
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b", ".join(vary)))
+                if not more_body:
+                    compressed = compressor.compress(body, flush=False) + compressor.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send(dict(start_message, headers=headers))
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send(dict(start_message, headers=headers))
+
+            # Streaming: flush every chunk so the client sees each one as soon as it is produced
+            data = compressor.compress(body, flush=True)
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
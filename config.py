@@ -0,0 +1,168 @@
+import os
+import tempfile
+from typing import Dict, Tuple
+
+# All settings come from the environment so Railway / docker run -e can tune them
+
+
+# CPUs this process may actually use: the affinity mask, capped by a cgroup v2 CPU quota
+# (docker --cpus, Kubernetes limits), which os.cpu_count() doesn't see
+def _available_cpus() -> int:
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+CPUS = _available_cpus()
+
+# Routers this instance serves: pdf (vouchers), mail (mail HTML), proxy (Bakuun / EaseMyTrip).
+# A proxy-only instance never imports the booking models, templates or renderer.
+ROUTERS = [name.strip() for name in os.getenv("ROUTERS", "pdf,mail,proxy").split(",") if name.strip()]
+
+# Server processes started by serve.py (the production entry point); each one runs its own
+# render pool, so by default the CPUs are split between them
+SERVER_WORKERS = max(1, int(os.getenv("SERVER_WORKERS", str(max(1, CPUS // 2)))))
+SERVER_BIND = os.getenv("SERVER_BIND", f"[::]:{os.getenv('PORT', '8000')}")
+# auto picks uvloop when it is installed
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+# Import the app and build the templates once, then fork the server processes from it
+SERVER_PRELOAD = os.getenv("SERVER_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Render executor (WeasyPrint runs in a process pool off the event loop), per server process
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(max(1, CPUS // SERVER_WORKERS))))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "32"))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "30"))
+# Honour HTML attributes such as align="right" / width="100%" the templates rely on
+RENDER_PRESENTATIONAL_HINTS = os.getenv("RENDER_PRESENTATIONAL_HINTS", "true").lower() in ("1", "true", "yes")
+# standard, small, smallest or full (see PDF_PROFILES in render.py); ?size= overrides it per request
+PDF_SIZE_PROFILE = os.getenv("PDF_SIZE_PROFILE", "standard")
+
+# Voucher image cache used as WeasyPrint's url_fetcher
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cygnus-assets"))
+ASSET_BUNDLE_DIR = os.getenv("ASSET_BUNDLE_DIR", "assets")
+ASSET_TTL = float(os.getenv("ASSET_TTL", "86400"))
+ASSET_FETCH_TIMEOUT = float(os.getenv("ASSET_FETCH_TIMEOUT", "10"))
+ASSET_RETRY_AFTER = float(os.getenv("ASSET_RETRY_AFTER", "60"))
+ASSET_PRELOAD = os.getenv("ASSET_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Rendered PDF cache (per worker, in memory)
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Batch voucher endpoints
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+# Asynchronous render jobs (submit now, download later)
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "cygnus-jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(RENDER_WORKERS)))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "256"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", "3600"))
+JOB_RENDER_TIMEOUT = float(os.getenv("JOB_RENDER_TIMEOUT", "300"))
+
+# Guest tables: rows per <table> in PDFs, so huge Bulk bookings lay out as many small tables
+GUEST_TABLE_CHUNK_ROWS = int(os.getenv("GUEST_TABLE_CHUNK_ROWS", "100"))
+
+# Startup warm-up: sample vouchers rendered in every render worker before /ready reports ready
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "120"))
+
+# Pooled upstream HTTP clients for the proxy routes (one per upstream host)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "60"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "30"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() in ("1", "true", "yes")
+UPSTREAM_PREWARM_CONNECTIONS = int(os.getenv("UPSTREAM_PREWARM_CONNECTIONS", "2"))
+# Relay proxy request/response bytes as-is instead of parsing and re-encoding the JSON
+PROXY_STREAMING = os.getenv("PROXY_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Search response cache: "route=ttl:stale,..." in seconds; routes not listed are never cached
+def _route_ttls(spec: str) -> Dict[str, Tuple[float, float]]:
+    ttls = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        route, _, times = item.partition("=")
+        ttl, _, stale = times.partition(":")
+        if float(ttl) > 0:
+            ttls[route.strip()] = (float(ttl), float(stale or 0))
+    return ttls
+
+
+# "name=value,..." -> {name: value}
+def _float_map(spec: str) -> Dict[str, float]:
+    values = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if value.strip():
+            values[name.strip()] = float(value)
+    return values
+
+
+SEARCH_CACHE_TTLS = _route_ttls(os.getenv(
+    "SEARCH_CACHE_TTLS", "/mps=30:60,/mpslive=30:60,/sps=30:60,/spslive=30:60,/getprop=300:600"
+))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# /search-fanout: suppliers asked when the request doesn't name any, and per-supplier deadlines
+FANOUT_SUPPLIERS = [name.strip() for name in os.getenv("FANOUT_SUPPLIERS", "mpslive,spslive,getprop").split(",") if name.strip()]
+FANOUT_DEADLINE = float(os.getenv("FANOUT_DEADLINE", "10"))
+FANOUT_DEADLINES = _float_map(os.getenv("FANOUT_DEADLINES", ""))
+
+# Upstream resilience: a latency budget per call (seconds, by upstream name as in upstreams.UPSTREAMS),
+# a circuit breaker per upstream, and retries / hedged requests for idempotent routes only
+UPSTREAM_BUDGET = float(os.getenv("UPSTREAM_BUDGET", "20"))
+UPSTREAM_BUDGETS = _float_map(os.getenv("UPSTREAM_BUDGETS", ""))
+
+# On shutdown the server stops accepting connections and waits this long for in-flight requests
+# (renders and upstream calls included), then as long again for queued render jobs
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv("SERVER_GRACEFUL_TIMEOUT", str(max(RENDER_TIMEOUT, UPSTREAM_BUDGET) + 5)))
+CIRCUIT_FAILURES = int(os.getenv("CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET = float(os.getenv("CIRCUIT_RESET", "30"))
+RETRY_ROUTES = {
+    route: int(retries)
+    for route, retries in _float_map(os.getenv("RETRY_ROUTES", "/mps=1,/mpslive=1,/sps=1,/spslive=1,/getprop=1")).items()
+}
+RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "0.2"))
+HEDGE_ROUTES = frozenset(route.strip() for route in os.getenv("HEDGE_ROUTES", "").split(",") if route.strip())
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "1"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+
+# Long-polling for /mpsoccupancy and /spsoccupancy token results (?wait=<seconds>)
+TOKEN_POLL_INTERVAL = float(os.getenv("TOKEN_POLL_INTERVAL", "1"))
+TOKEN_POLL_MAX_WAIT = float(os.getenv("TOKEN_POLL_MAX_WAIT", "25"))
+TOKEN_PENDING_STATUSES = frozenset(
+    status.strip().lower()
+    for status in os.getenv("TOKEN_PENDING_STATUSES", "pending,inprogress,in progress,in_progress,processing").split(",")
+    if status.strip()
+)
+
+# Response compression (gzip, or brotli when the brotli package is installed)
+COMPRESSION = os.getenv("COMPRESSION", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Collapse whitespace and drop comments in the mail templates when they are loaded
+MAIL_MINIFY = os.getenv("MAIL_MINIFY", "true").lower() in ("1", "true", "yes")
+
+# Logging: JSON lines written by a background thread (see logs.py). Bodies are logged at DEBUG,
+# e.g. LOG_ROUTE_LEVELS=/mps=DEBUG to see the /mps payloads without turning DEBUG on everywhere
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_ROUTE_LEVELS = {
+    route.strip(): level.strip()
+    for route, _, level in (item.partition("=") for item in os.getenv("LOG_ROUTE_LEVELS", "").split(","))
+    if level.strip()
+}
+LOG_BODY_SAMPLE_RATE = float(os.getenv("LOG_BODY_SAMPLE_RATE", "1"))
+LOG_BODY_MAX_BYTES = int(os.getenv("LOG_BODY_MAX_BYTES", "4096"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Server-Timing response header with the stage durations of each request (see metrics.py)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
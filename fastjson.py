@@ -0,0 +1,49 @@
+from typing import Any, Callable
+
+import orjson
+from fastapi import Request
+from fastapi.routing import APIRoute
+
+import logs
+
+# JSON on the hot paths goes through orjson instead of the stdlib parser. Booking payloads
+# (a bulk TABLEDATA easily runs to thousands of cells) are decoded by orjson before Pydantic
+# sees them, and supplier answers of several hundred KB are parsed and re-encoded by orjson.
+# The models themselves are unchanged, so the OpenAPI schema, defaults and Optional fields
+# stay exactly as they were.
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so FastAPI still answers a malformed
+# body with its usual 422 and every `except ValueError` keeps working
+loads = orjson.loads
+
+
+def dumps(value: Any) -> bytes:
+    # Non-str keys (e.g. ints from an upstream payload that was modified) are allowed like in json.dumps
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONRequest(Request):
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    # FastAPI decodes JSON bodies with request.json(); hand it a request that uses orjson.
+    # Also records the matched route template for logs and metrics labels.
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def orjson_handler(request: Request):
+            logs.route_var.set(self.path)
+            return await handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_handler
+
+
+# Same, as str, for log lines; values orjson can't encode (exceptions, sets) fall back to str()
+def dumps_text(value: Any) -> str:
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
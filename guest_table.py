@@ -0,0 +1,141 @@
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+import config
+import metrics
+
+# Guest tables are built column by column from TABLEDATA (a dict of parallel lists).
+# Columns are checked once for matching lengths instead of indexing every list per row,
+# and cells carry no inline styles in the PDF: the voucher templates style
+# table.guest-table once. Very large tables are split into several <table>s so
+# WeasyPrint lays out many small tables rather than one huge one.
+
+# Email clients drop <style> blocks, so mail cells keep a (minimal) inline style
+MAIL_TABLE_STYLE = "border-collapse: collapse; width: 100%; font-size:16px;"
+MAIL_CELL_STYLE = "text-align: center; padding: 8px;"
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+class TableColumns:
+    # Validated view over TABLEDATA: every column used has exactly row_count entries
+
+    def __init__(self, table_data: Dict[str, list], row_count: int):
+        self.table_data = table_data
+        self.row_count = row_count
+
+    @classmethod
+    def from_tabledata(cls, table_data: Optional[Dict[str, list]], count_column: str = "GUESTNAME") -> Optional["TableColumns"]:
+        if not table_data or count_column not in table_data:
+            return None
+        return cls(table_data, len(table_data[count_column] or []))
+
+    def column(self, name: str) -> List[str]:
+        values = self.table_data.get(name)
+        # A column the client didn't send renders as blank cells
+        if values is None:
+            return [""] * self.row_count
+        if len(values) != self.row_count:
+            raise HTTPException(
+                status_code=422,
+                detail=f"TABLEDATA column {name} has {len(values)} entries, expected {self.row_count}",
+            )
+        return [_cell(value) for value in values]
+
+    def guest_names_complete(self) -> bool:
+        return all(name.strip() for name in self.column("GUESTNAME"))
+
+
+def _render(headers: List[str], rows: Iterable[List[str]], table_open: str, cell_attrs: str, chunk_rows: Optional[int]) -> str:
+    header_row = "<tr>" + "".join(f"<th{cell_attrs}>{header}</th>" for header in headers) + "</tr>"
+    table_head = f"{table_open}<thead>{header_row}</thead><tbody>"
+    table_tail = "</tbody></table>"
+
+    parts = [table_head]
+    in_chunk = 0
+    for row in rows:
+        if chunk_rows and in_chunk == chunk_rows:
+            parts.append(table_tail)
+            parts.append(table_head)
+            in_chunk = 0
+        parts.append("<tr>" + "".join(f"<td{cell_attrs}>{cell}</td>" for cell in row) + "</tr>")
+        in_chunk += 1
+    parts.append(table_tail)
+    return "".join(parts)
+
+
+def _single_rows(columns: TableColumns, names: List[str]) -> Iterable[List[str]]:
+    for i, cells in enumerate(zip(*(columns.column(name) for name in names)), 1):
+        yield [str(i), *cells]
+
+
+def _bulk_rows(columns: TableColumns, with_guest_name: bool, extra: List[str]) -> Iterable[List[str]]:
+    guest_names = columns.column("GUESTNAME") if with_guest_name else None
+    descriptions = (
+        f"{room_type}-{occupancy}-{meal_plan} x {qty}"
+        for room_type, occupancy, meal_plan, qty in zip(
+            columns.column("ROOMTYPE"), columns.column("OCC"), columns.column("MEALPLAN"), columns.column("QTY")
+        )
+    )
+    stays = (f"{checkin} to {checkout}" for checkin, checkout in zip(columns.column("CHECKIN"), columns.column("CHECKOUT")))
+    extra_columns = [columns.column(name) for name in extra]
+    for i, (stay, description, *rest) in enumerate(zip(stays, descriptions, *extra_columns)):
+        row = [str(i + 1)]
+        if guest_names is not None:
+            row.append(guest_names[i])
+        row.extend((stay, description, *rest))
+        yield row
+
+
+@metrics.timed("guest_table")
+def generate_guest_table1(table_data: Optional[Dict[str, list]], booking_type: Optional[str]) -> str:
+    columns = TableColumns.from_tabledata(table_data)
+    if columns is None:
+        return ""
+    table_open = '<table class="guest-table">'
+    chunk_rows = config.GUEST_TABLE_CHUNK_ROWS
+
+    if booking_type != "Bulk":
+        headers = ["S.no", "Guest Name", "Room Type", "Occupancy", "Meal Plan"]
+        rows = _single_rows(columns, ["GUESTNAME", "ROOMTYPE", "OCC", "MEALPLAN"])
+        return _render(headers, rows, table_open, "", chunk_rows)
+
+    with_guest_name = columns.guest_names_complete()
+    headers = ["S.no"] + (["Guest Name"] if with_guest_name else []) + ["Check In & Out", "Description", "Nights"]
+    rows = _bulk_rows(columns, with_guest_name, ["NIGHTS"])
+    return _render(headers, rows, table_open, "", chunk_rows)
+
+
+def generate_guest_table(table_data: Optional[Dict[str, list]]) -> str:
+    return generate_guest_table1(table_data, None)
+
+
+@metrics.timed("guest_table")
+def generate_mail_guest_table(table_data: Optional[Dict[str, list]], booking_type: Optional[str], inclusion_services: bool = True) -> str:
+    table_open = f'<table style="{MAIL_TABLE_STYLE}">'
+    cell_attrs = f' style="{MAIL_CELL_STYLE}"'
+
+    if booking_type == "Bulk":
+        # Bulk mail rows follow the room list; guest names may be blank
+        columns = TableColumns.from_tabledata(table_data, count_column="ROOMTYPE")
+        if columns is None:
+            return ""
+        guest_names = columns.table_data.get("GUESTNAME") or []
+        with_guest_name = len(guest_names) == columns.row_count and columns.guest_names_complete()
+        headers = ["S.no"] + (["Guest Name"] if with_guest_name else []) + ["Check In & Out", "Description", "Inclusion Services", "Nights"]
+        rows = _bulk_rows(columns, with_guest_name, ["INCLUSION_SERVICES", "NIGHTS"])
+        return _render(headers, rows, table_open, cell_attrs, None)
+
+    columns = TableColumns.from_tabledata(table_data)
+    if columns is None:
+        return ""
+    if inclusion_services:
+        headers = ["S.no", "Guest Name", "Room Type", "Occupancy", "Inclusion Services", "Meal Plan"]
+        names = ["GUESTNAME", "ROOMTYPE", "OCC", "INCLUSION_SERVICES", "MEALPLAN"]
+    else:
+        headers = ["S.no", "Guest Name", "Room Type", "Occupancy", "Meal Plan"]
+        names = ["GUESTNAME", "ROOMTYPE", "OCC", "MEALPLAN"]
+    return _render(headers, _single_rows(columns, names), table_open, cell_attrs, None)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+import config
+import metrics
+from render import render_executor, pdf_cache
+
+# Long renders (big Bulk vouchers) run as jobs: submit returns an id straight away, a small
+# pool of asyncio workers feeds the render executor, and finished PDFs land in a spool
+# directory next to a <job_id>.json status file. Status lives on disk so any server worker
+# process can answer status/download calls for a job another process accepted.
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class RenderJobs:
+
+    def __init__(self, spool_dir: str, workers: int, queue_size: int, retention: float, timeout: float):
+        self.spool_dir = spool_dir
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.retention = retention
+        self.timeout = timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _path(self, job_id: str, extension: str) -> str:
+        return os.path.join(self.spool_dir, f"{job_id}.{extension}")
+
+    def _write_status(self, job: Dict) -> None:
+        # Write then rename so a status poll never sees a half-written file
+        path = self._path(job["job_id"], "json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(job, file)
+        os.replace(tmp_path, path)
+
+    def _write_pdf(self, job_id: str, pdf: bytes) -> None:
+        path = self._path(job_id, "pdf")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(pdf)
+        os.replace(tmp_path, path)
+
+    async def start(self) -> None:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+
+    async def stop(self, drain: float = 0) -> None:
+        # Give queued and running jobs up to `drain` seconds to finish before cancelling them
+        if drain > 0 and self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), drain)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs still queued in this process are lost with it; say so instead of leaving them "queued"
+        while self._queue is not None and not self._queue.empty():
+            job, _, _ = self._queue.get_nowait()
+            self._finish(job, error="Server shut down before the job ran")
+
+    def _finish(self, job: Dict, pdf: Optional[bytes] = None, error: Optional[str] = None) -> None:
+        if pdf is not None:
+            self._write_pdf(job["job_id"], pdf)
+            job.update(status="done", size=len(pdf))
+        else:
+            job.update(status="failed", error=error)
+        job["finished_at"] = time.time()
+        self._write_status(job)
+
+    def submit(
+        self, html_content: str, filename: str, cache_key: Optional[str] = None, profile: str = "standard"
+    ) -> Dict:
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Render jobs are not running")
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "filename": filename,
+            "profile": profile,
+            "created_at": time.time(),
+            "finished_at": None,
+            "size": None,
+            "error": None,
+        }
+        # Already rendered once: the job is done before it is queued
+        cached_pdf = pdf_cache.get(cache_key) if cache_key else None
+        if cached_pdf is not None:
+            self._finish(job, pdf=cached_pdf)
+            return job
+        try:
+            self._queue.put_nowait((job, html_content, cache_key))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail="Render job queue is full, retry shortly")
+        self._write_status(job)
+        return job
+
+    # A full render queue only delays a job; it fails on render errors and timeouts
+    async def _render(self, html_content: str, profile: str) -> bytes:
+        while True:
+            try:
+                return await render_executor.render_pdf(html_content, timeout=self.timeout, profile=profile)
+            except HTTPException as e:
+                if e.status_code != 503:
+                    raise
+            await render_executor.wait_for_slot()
+
+    async def _worker(self) -> None:
+        while True:
+            job, html_content, cache_key = await self._queue.get()
+            try:
+                job["status"] = "running"
+                self._write_status(job)
+                pdf = await self._render(html_content, job["profile"])
+                if cache_key:
+                    pdf_cache.put(cache_key, pdf)
+                self._finish(job, pdf=pdf)
+            except asyncio.CancelledError:
+                self._finish(job, error="Server shut down while the job was running")
+                raise
+            except HTTPException as e:
+                self._finish(job, error=str(e.detail))
+            except Exception as e:
+                self._finish(job, error=f"PDF generation failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        if not _JOB_ID_RE.match(job_id):
+            return None
+        try:
+            with open(self._path(job_id, "json"), "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def pdf_path(self, job_id: str) -> str:
+        return self._path(job_id, "pdf")
+
+    def cleanup(self) -> int:
+        # Drop spool files older than the retention window
+        removed = 0
+        cutoff = time.time() - self.retention
+        try:
+            names = os.listdir(self.spool_dir)
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    async def _cleanup_loop(self) -> None:
+        while True:
+            await asyncio.to_thread(self.cleanup)
+            await asyncio.sleep(min(self.retention, 300))
+
+
+render_jobs = RenderJobs(
+    spool_dir=config.JOB_SPOOL_DIR,
+    workers=config.JOB_WORKERS,
+    queue_size=config.JOB_QUEUE_SIZE,
+    retention=config.JOB_RETENTION,
+    timeout=config.JOB_RENDER_TIMEOUT,
+)
+
+metrics.Callback(
+    "render_jobs_queued", "Background render jobs waiting for a job worker", "gauge",
+    lambda: {(): render_jobs._queue.qsize() if render_jobs._queue is not None else 0},
+)
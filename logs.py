@@ -0,0 +1,205 @@
+import atexit
+import logging
+import queue
+import random
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+import config
+import fastjson
+
+# Structured (one JSON object per line) logging that never writes on the event loop: handlers
+# only put the record on a bounded queue, and a background thread formats and writes it.
+# When the queue is full records are dropped and counted rather than blocking a request.
+# Every record carries the id and path of the request it was logged from. Request and
+# response bodies are logged at DEBUG, sampled and truncated (see log_body), and the level
+# can be lowered for single routes with LOG_ROUTE_LEVELS.
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+route_var: ContextVar[Optional[str]] = ContextVar("route", default=None)
+
+_ROOT = "voucher"
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+_RECORD_ATTRS = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id", "route"}
+
+_base_level = logging.INFO
+_route_levels = {}
+_listener: Optional[QueueListener] = None
+
+
+def _level(name: str) -> int:
+    level = logging.getLevelName(name.strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level {name}")
+    return level
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{_ROOT}.{name}")
+
+
+def level_for_route(route: Optional[str]) -> int:
+    return _route_levels.get(route, _base_level)
+
+
+# Cheap check before building anything expensive to log
+def enabled(logger: logging.Logger, level: int) -> bool:
+    return level >= level_for_route(route_var.get()) and logger.isEnabledFor(level)
+
+
+class _ContextFilter(logging.Filter):
+    # Runs in the logging thread's caller, so the context variables are still those of the request
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.route = route_var.get()
+        return record.levelno >= level_for_route(record.route)
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "route", None):
+            entry["route"] = record.route
+        # Anything passed with extra={...}
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return fastjson.dumps_text(entry)
+
+
+class _DroppingQueueHandler(QueueHandler):
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is left to the writer thread; callers only log immutable values
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# Queue + writer thread in the server process; background=False writes directly (render workers,
+# which log rarely and have no event loop to protect)
+def configure(background: bool = True) -> None:
+    global _base_level, _route_levels, _listener
+    _base_level = _level(config.LOG_LEVEL)
+    _route_levels = {route: _level(name) for route, name in config.LOG_ROUTE_LEVELS.items()}
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JSONFormatter())
+    if background:
+        handler = _DroppingQueueHandler(queue.Queue(config.LOG_QUEUE_SIZE))
+        stop()
+        _listener = QueueListener(handler.queue, stream)
+        _listener.start()
+    else:
+        handler = stream
+    handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger(_ROOT)
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    # The logger lets through the most verbose level any route asks for; the filter does the rest
+    root.setLevel(min([_base_level, *_route_levels.values()]))
+    root.propagate = False
+
+
+# Flush what is still queued and stop the writer thread
+@atexit.register
+def stop() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped() -> int:
+    return sum(getattr(handler, "dropped", 0) for handler in logging.getLogger(_ROOT).handlers)
+
+
+def _truncate(body: Any) -> str:
+    if isinstance(body, (bytes, bytearray)):
+        data = bytes(body)
+    elif isinstance(body, str):
+        data = body.encode("utf-8", "replace")
+    else:
+        data = fastjson.dumps(body)
+    limit = config.LOG_BODY_MAX_BYTES
+    if len(data) <= limit:
+        return data.decode("utf-8", "replace")
+    return data[:limit].decode("utf-8", "ignore") + f"...[{len(data) - limit} more bytes]"
+
+
+# Request / response payloads: only serialised when DEBUG is on for the route and the sample hits
+def log_body(logger: logging.Logger, message: str, body: Any, level: int = logging.DEBUG) -> None:
+    if not enabled(logger, level) or random.random() >= config.LOG_BODY_SAMPLE_RATE:
+        return
+    size = len(body) if isinstance(body, (bytes, bytearray, str)) else None
+    logger.log(level, message, extra={"body": _truncate(body), "body_bytes": size})
+
+
+class RequestContextMiddleware:
+    # Tags every record logged while handling a request with its id (the client's X-Request-ID
+    # when it sends a sane one) and path, echoes the id back and logs one line per request
+
+    def __init__(self, app):
+        self.app = app
+        self.logger = get_logger("access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        request_token = request_id_var.set(request_id)
+        route_token = route_var.set(scope["path"])
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = dict(message, headers=[*message.get("headers", []), (b"x-request-id", request_id.encode())])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            self.logger.info(
+                "request",
+                extra={
+                    "method": scope["method"],
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                },
+            )
+            request_id_var.reset(request_token)
+            route_var.reset(route_token)
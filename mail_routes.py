@@ -0,0 +1,47 @@
+from typing import Optional, Dict, List
+
+from fastapi import APIRouter
+from fastapi.responses import HTMLResponse
+
+import fastjson
+import logs
+from guest_table import generate_mail_guest_table
+from models import BookingDataMail, check_batch_size
+from templating import LEGACY_MAIL_VARIANT, booking_variant, fill_template, template_variant
+
+log = logs.get_logger("main")
+
+# Mail HTML routes: templates and guest tables only, nothing here loads the PDF renderer
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+@router.post("/booking-confirmation-mail")
+async def booking_confirmation1(data: BookingDataMail):
+    html_content = template_variant("voucherMail.html", LEGACY_MAIL_VARIANT, mail=True)
+
+    table = generate_mail_guest_table(data.TABLEDATA, None, inclusion_services=False)
+
+    html_content = fill_template(html_content, data, table)
+
+    return HTMLResponse(content=html_content, status_code=200)
+
+# Mail HTML for one booking, shared by the single and batch mail endpoints
+def build_mail_html(data: BookingDataMail, context: Optional[Dict[str, str]] = None) -> str:
+    template_name = "BulkVoucherMail.html" if data.typeofbooking == "Bulk" else "voucherMail.html"
+    html_content = template_variant(template_name, booking_variant(data), mail=True)
+    if data.typeofbooking != "Bulk":
+        logs.log_body(log, "Mail guest table data", data.TABLEDATA)
+
+    table = generate_mail_guest_table(data.TABLEDATA, data.typeofbooking)
+
+    return fill_template(html_content, data, table, context)
+
+@router.post("/booking-confirmation-mail-test")
+async def booking_confirmation2(data: BookingDataMail):
+    html_content = build_mail_html(data)
+
+    return HTMLResponse(content=html_content, status_code=200)
+
+@router.post("/booking-confirmation-mail-batch")
+async def booking_confirmation_mail_batch(data: List[BookingDataMail]):
+    check_batch_size(len(data))
+    return [build_mail_html(booking) for booking in data]
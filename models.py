@@ -0,0 +1,165 @@
+from typing import Optional, Dict
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+import config
+
+# Booking payloads of the PDF and mail routes. Only imported by those routers, so an instance
+# that serves nothing but the proxy routes never builds these models.
+
+# Optimize the Pydantic model with better typing and validation
+class GuestInfo(BaseModel):
+    name: str
+    room_type: str
+    occupancy: str
+    meal_plan: str
+
+class BookingData(BaseModel):
+    NAME: Optional[str] = Field(None, description="Guest name")
+    CHECKIN: Optional[str] = Field(None, description="Check-in date")
+    CHECKOUT: Optional[str] = Field(None, description="Check-out date")
+    DAYOF_CHECKIN: Optional[str] = None
+    DAYOF_CHECKOUT11: Optional[str] = None
+    NO_OF_NIGHTS: Optional[str] = None
+    CHECK_IN_TIME: Optional[str] = None
+    CHECK_OUT_TIME: Optional[str] = None
+    HOTELNAME: Optional[str] = None
+    HOTELADDRESS: Optional[str] = None
+    HOTELPHONE: Optional[str] = None
+    ROOMCOUNT: Optional[str] = None
+    CLIENT: Optional[str] = None
+    GUESTCOUNT: Optional[str] = None
+    ROOM_CHARGES: Optional[str] = None
+    INCLUSIONS: Optional[str] = None
+    SUBTOTAL: Optional[str] = None
+    GST_VALUE: Optional[str] = None
+    AMT_TO_BE_PAID: Optional[str] = None
+    PAYMENTMODE: Optional[str] = None
+    LOCATIONLINK: Optional[str] = None
+    CANCELLATIONPOLICY: Optional[str] = None
+    ADDON_POLICES: Optional[str] = None
+    DEFAULT_POLICES: Optional[str] = None
+    EMPNAME: Optional[str] = None
+    EMPPHONE: Optional[str] = None
+    EMPEMAIL: Optional[str] = None
+    TABLEDATA: Optional[Dict[str, list]] = None
+    SHOWTRAIFF: Optional[str] = None
+    CLIENT_GST: Optional[str] = None
+    FILENAME: Optional[str] = None
+    Booking_Date: Optional[str] = None
+    Booking_Id: Optional[str] = None
+    Brid: Optional[str] = None
+    GST_PRECENT: Optional[str] = None
+    NEARBY:Optional[str] = None
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "NAME": "John Doe",
+                "CHECKIN": "2024-01-01",
+                # Add other example values as needed
+            }
+        }
+
+#for vochuer for email
+class BookingDataMail(BaseModel):
+    NAME: str = None
+    CHECKIN: str = None
+    CHECKOUT: str = None
+    DAYOF_CHECKIN: str = None
+    DAYOF_CHECKOUT11: str = None
+    NO_OF_NIGHTS: str = None
+    CHECK_IN_TIME: str = None
+    CHECK_OUT_TIME: str = None
+    HOTELNAME: str = None
+    HOTELADDRESS: str = None
+    HOTELPHONE: str = None
+    ROOMCOUNT: str = None
+    CLIENT: str = None
+
+    GUESTCOUNT:str = None
+    ROOM_CHARGES: str = None
+    INCLUSIONS: str = None
+    SUBTOTAL: str = None
+    GST_VALUE: str = None
+    AMT_TO_BE_PAID: str = None
+    PAYMENTMODE: str = None
+    LOCATIONLINK:str = None
+    #IMGLINK:str
+    CANCELLATIONPOLICY:str=None
+    ADDON_POLICES:str=None 
+    DEFAULT_POLICES:str=None
+    EMPNAME:str = None
+    EMPPHONE:str = None
+    EMPEMAIL:str =None
+    TABLEDATA: Optional[Dict[str, list]] = None
+    SHOWTRAIFF: str = None
+    CLIENT_GST:str = None
+    FILENAME:str = None
+    typeofbooking :str = None
+    Booking_Date:str = None
+    Booking_Id:Optional[str] = None
+    Brid:str=None
+    GST_PRECENT:str = None
+
+#TESTING VOCUHER PDF
+class GuestInfo1(BaseModel):
+    name: str
+    room_type: str
+    occupancy: str
+    meal_plan: str
+
+class BookingData1(BaseModel):
+    typeofbooking: str = None
+    NAME: Optional[str] = Field(None, description="Guest name")
+    CHECKIN: Optional[str] = Field(None, description="Check-in date")
+    CHECKOUT: Optional[str] = Field(None, description="Check-out date")
+    DAYOF_CHECKIN: Optional[str] = None
+    DAYOF_CHECKOUT11: Optional[str] = None
+    NO_OF_NIGHTS: Optional[str] = None
+    CHECK_IN_TIME: Optional[str] = None
+    CHECK_OUT_TIME: Optional[str] = None
+    HOTELNAME: Optional[str] = None
+    HOTELADDRESS: Optional[str] = None
+    HOTELPHONE: Optional[str] = None
+    ROOMCOUNT: Optional[str] = None
+    CLIENT: Optional[str] = None
+    GUESTCOUNT: Optional[str] = None
+    ROOM_CHARGES: Optional[str] = None
+    INCLUSIONS: Optional[str] = None
+    SUBTOTAL: Optional[str] = None
+    GST_VALUE: Optional[str] = None
+    AMT_TO_BE_PAID: Optional[str] = None
+    PAYMENTMODE: Optional[str] = None
+    LOCATIONLINK: Optional[str] = None
+    CANCELLATIONPOLICY: Optional[str] = None
+    ADDON_POLICES: Optional[str] = None
+    DEFAULT_POLICES: Optional[str] = None
+    EMPNAME: Optional[str] = None
+    EMPPHONE: Optional[str] = None
+    EMPEMAIL: Optional[str] = None
+    TABLEDATA: Optional[Dict[str, list]] = None
+    SHOWTRAIFF: Optional[str] = None
+    CLIENT_GST: Optional[str] = None
+    FILENAME: Optional[str] = None
+    Booking_Date: Optional[str] = None
+    Booking_Id: Optional[str] = None
+    Brid: Optional[str] = None
+    GST_PRECENT: Optional[str] = None
+    NEARBY: Optional[str] = None
+
+    class Config1:
+        schema_extra = {
+            "example": {
+                "NAME": "John Doe",
+                "CHECKIN": "2024-01-01",
+            }
+        }
+
+# Batch endpoints (PDF and mail) take at most BATCH_MAX_ITEMS bookings
+def check_batch_size(count: int) -> None:
+    if count == 0:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if count > config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch has {count} bookings, the limit is {config.BATCH_MAX_ITEMS}")
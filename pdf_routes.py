@@ -0,0 +1,340 @@
+from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Any, Optional, Dict, List
+import asyncio
+import base64
+import io
+import re
+import uuid
+import zipfile
+
+import assets
+import config
+import fastjson
+import logs
+from caching import etag_matches
+from jobs import render_jobs
+from render import render_executor, pdf_cache, pdf_cache_key, pdf_profile
+from guest_table import generate_guest_table, generate_guest_table1
+from mail_routes import build_mail_html
+from models import BookingData, BookingData1, check_batch_size
+from templating import PDF_TEMPLATES, booking_context, booking_variant, fill_template, legacy_pdf_variant, template_variant, template_version
+
+log = logs.get_logger("pdf")
+
+# Voucher PDF routes. WeasyPrint itself is only loaded by the render workers (see render.py),
+# so importing this router costs the models and templates, not Pango.
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+# Serve PDFs with a content-addressed ETag so clients can revalidate instead of re-downloading,
+# and the size profile they were rendered with
+def pdf_response(pdf: bytes, filename: str, etag: str, profile: str) -> Response:
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"inline; filename={filename}",
+            "Content-Length": str(len(pdf)),
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+            "X-PDF-Profile": profile,
+        },
+    )
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+@router.post("/booking-confirmation")
+async def booking_confirmation(data: BookingData, request: Request, size: Optional[str] = None):
+    try:
+        profile = pdf_profile(size)
+        # Same payload + same templates => same PDF, so answer repeats from the cache
+        cache_key = pdf_cache_key("/booking-confirmation", data, template_version(*PDF_TEMPLATES), profile)
+        etag = f'"{cache_key}"'
+        filename = f"{data.FILENAME}.pdf" if data.FILENAME else "booking_confirmation.pdf"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        cached_pdf = pdf_cache.get(cache_key)
+        if cached_pdf is not None:
+            return pdf_response(cached_pdf, filename, etag, profile)
+
+        # Prebuilt template variant for this tariff / policies combination
+        html_content = template_variant("voucher.html", legacy_pdf_variant(data))
+
+        # Generate guest table
+        table = generate_guest_table(data.TABLEDATA)
+
+        # Fill placeholders in one pass over the compiled template
+        html_content = fill_template(html_content, data, table)
+
+        # Generate PDF in the render pool so the event loop stays free
+        pdf = await render_executor.render_pdf(html_content, profile=profile)
+        pdf_cache.put(cache_key, pdf)
+        return pdf_response(pdf, filename, etag, profile)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Voucher HTML for one booking, shared by the single and batch PDF endpoints
+def build_voucher_html(data: BookingData1, context: Optional[Dict[str, str]] = None) -> str:
+    template_name = "Bulkvoucher.html" if data.typeofbooking == "Bulk" else "voucher.html"
+    html_content = template_variant(template_name, booking_variant(data))
+
+    table = generate_guest_table1(data.TABLEDATA,data.typeofbooking)
+
+    return fill_template(html_content, data, table, context)
+
+@router.post("/booking-confirmation-test")
+async def booking_confirmation_test(data: BookingData1, request: Request, size: Optional[str] = None):
+    try:
+        profile = pdf_profile(size)
+        cache_key = pdf_cache_key("/booking-confirmation-test", data, template_version(*PDF_TEMPLATES), profile)
+        etag = f'"{cache_key}"'
+        filename = f"{data.FILENAME}.pdf" if data.FILENAME else "booking_confirmation.pdf"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        cached_pdf = pdf_cache.get(cache_key)
+        if cached_pdf is not None:
+            return pdf_response(cached_pdf, filename, etag, profile)
+
+        html_content = build_voucher_html(data)
+
+        pdf = await render_executor.render_pdf(html_content, profile=profile)
+        pdf_cache.put(cache_key, pdf)
+        return pdf_response(pdf, filename, etag, profile)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# TESTING VOCUHER PDF
+
+# Sample bookings for the warm-up: every render worker lays them out as it starts, so the
+# first real voucher finds Pango, fonts and images loaded (see main.warm_up)
+WARMUP_TABLEDATA = {
+    "GUESTNAME": ["Warm Up", "Warm Up", "Warm Up"],
+    "ROOMTYPE": ["Deluxe", "Deluxe", "Suite"],
+    "OCC": ["Double", "Double", "Single"],
+    "MEALPLAN": ["CP", "MAP", "AP"],
+    "CHECKIN": ["2024-01-01", "2024-01-01", "2024-01-02"],
+    "CHECKOUT": ["2024-01-03", "2024-01-03", "2024-01-03"],
+    "QTY": ["1", "1", "1"],
+    "NIGHTS": ["2", "2", "1"],
+    "INCLUSION_SERVICES": ["Breakfast", "Breakfast", "Breakfast"],
+}
+
+def warmup_bookings() -> List[BookingData1]:
+    sample = dict(
+        NAME="Warm Up", CHECKIN="2024-01-01", CHECKOUT="2024-01-03", NO_OF_NIGHTS="2",
+        HOTELNAME="Warm Up Hotel", HOTELADDRESS="1 Warm Up Road", ROOMCOUNT="3", GUESTCOUNT="3",
+        ROOM_CHARGES="1000", INCLUSIONS="0", SUBTOTAL="1000", GST_VALUE="120", AMT_TO_BE_PAID="1120",
+        PAYMENTMODE="Bill to Company", SHOWTRAIFF="Yes", ADDON_POLICES="-", DEFAULT_POLICES="-",
+        CANCELLATIONPOLICY="-", TABLEDATA=WARMUP_TABLEDATA,
+    )
+    return [BookingData1(**sample), BookingData1(typeofbooking="Bulk", **sample)]
+
+# Voucher PDF and mail HTML for one booking in one request: the payload is validated and the
+# template values are built once for both. The PDF renders in the pool while the mail is built.
+# format=multipart (default) streams a multipart/mixed body whose first part, the mail HTML, is
+# sent before the PDF is ready; if the render then fails, the second part is a JSON error
+# ({"status_code", "detail"}) instead of the PDF. format=json waits for both and returns
+# {"filename", "etag", "html", "pdf"} with the PDF base64 encoded.
+BUNDLE_FORMATS = ("multipart", "json")
+
+async def render_voucher_into_cache(cache_key: str, html_content: str, profile: str) -> bytes:
+    pdf = await render_executor.render_pdf(html_content, profile=profile)
+    pdf_cache.put(cache_key, pdf)
+    return pdf
+
+async def bundle_parts(boundary: str, mail_html: str, pdf_task: asyncio.Future, filename: str, etag: str):
+    yield (
+        f"--{boundary}\r\nContent-Type: text/html; charset=utf-8\r\n"
+        f'Content-Disposition: inline; name="mail"\r\n\r\n'
+    ).encode() + mail_html.encode() + b"\r\n"
+    try:
+        pdf = await pdf_task
+        yield (
+            f"--{boundary}\r\nContent-Type: application/pdf\r\nContent-Length: {len(pdf)}\r\nETag: {etag}\r\n"
+            f'Content-Disposition: attachment; name="pdf"; filename="{filename}"\r\n\r\n'
+        ).encode() + pdf + b"\r\n"
+    except HTTPException as e:
+        yield (
+            f"--{boundary}\r\nContent-Type: application/json\r\n"
+            f'Content-Disposition: inline; name="pdf"\r\n\r\n'
+        ).encode() + fastjson.dumps({"status_code": e.status_code, "detail": e.detail}) + b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+@router.post("/booking-confirmation-bundle")
+async def booking_confirmation_bundle(data: BookingData1, format: str = "multipart", size: Optional[str] = None):
+    if format not in BUNDLE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(BUNDLE_FORMATS)}")
+    pdf_task = None
+    try:
+        profile = pdf_profile(size)
+        # Same cache entry as /booking-confirmation-test, so either endpoint reuses the other's render
+        cache_key = pdf_cache_key("/booking-confirmation-test", data, template_version(*PDF_TEMPLATES), profile)
+        etag = f'"{cache_key}"'
+        filename = f"{data.FILENAME}.pdf" if data.FILENAME else "booking_confirmation.pdf"
+        context = booking_context(data)
+        cached_pdf = pdf_cache.get(cache_key)
+        if cached_pdf is not None:
+            pdf_task = asyncio.get_running_loop().create_future()
+            pdf_task.set_result(cached_pdf)
+        else:
+            pdf_task = asyncio.ensure_future(render_voucher_into_cache(cache_key, build_voucher_html(data, context), profile))
+            # Rendered for the cache even if the client leaves before the PDF part is sent
+            pdf_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        mail_html = build_mail_html(data, context)
+
+        if format == "json":
+            pdf = await pdf_task
+            return {
+                "filename": filename,
+                "etag": etag,
+                "html": mail_html,
+                "pdf": base64.b64encode(pdf).decode(),
+                "pdf_bytes": len(pdf),
+                "pdf_profile": profile,
+            }
+    except HTTPException:
+        raise
+    except Exception as e:
+        if pdf_task is not None:
+            pdf_task.cancel()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    boundary = uuid.uuid4().hex
+    return StreamingResponse(
+        bundle_parts(boundary, mail_html, pdf_task, filename, etag),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
+
+# Render jobs: long vouchers are rendered in the background instead of holding the request open
+@router.post("/render-jobs", status_code=202)
+async def submit_render_job(data: BookingData1, size: Optional[str] = None):
+    try:
+        profile = pdf_profile(size)
+        cache_key = pdf_cache_key("/booking-confirmation-test", data, template_version(*PDF_TEMPLATES), profile)
+        filename = f"{data.FILENAME}.pdf" if data.FILENAME else "booking_confirmation.pdf"
+        job = render_jobs.submit(build_voucher_html(data), filename, cache_key, profile)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return dict(job, status_url=f"/render-jobs/{job['job_id']}", download_url=f"/render-jobs/{job['job_id']}/pdf")
+
+@router.get("/render-jobs/{job_id}")
+async def render_job_status(job_id: str):
+    job = render_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+@router.get("/render-jobs/{job_id}/pdf")
+async def render_job_pdf(job_id: str):
+    job = render_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return FileResponse(
+        render_jobs.pdf_path(job_id),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"inline; filename={job['filename']}", "X-PDF-Profile": job.get("profile", "standard")}
+    )
+
+# Batch vouchers for group / corporate bookings: one request, validation and template load per batch
+BATCH_OUTPUTS = ("zip", "pdf")
+
+UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+# FILENAME comes from the client: keep only its last path segment and a safe character set,
+# so an entry can't escape the archive's root (zip slip) or clash with another voucher
+def batch_filenames(bookings: List[BookingData1]) -> List[str]:
+    names, seen = [], set()
+    for i, booking in enumerate(bookings, 1):
+        stem = re.split(r"[/\\]", booking.FILENAME or "")[-1]
+        stem = UNSAFE_FILENAME_CHARS.sub("_", stem).lstrip(".")[:100] or f"booking_confirmation_{i}"
+        name, n = f"{stem}.pdf", i
+        while name in seen:
+            name = f"{stem}_{n}.pdf"
+            n += 1
+        seen.add(name)
+        names.append(name)
+    return names
+
+async def render_voucher_cached(booking: BookingData1, slots: asyncio.Semaphore, profile: str) -> bytes:
+    # Shares the single-voucher cache, so a batch re-run only renders what changed
+    cache_key = pdf_cache_key("/booking-confirmation-test", booking, template_version(*PDF_TEMPLATES), profile)
+    cached_pdf = pdf_cache.get(cache_key)
+    if cached_pdf is not None:
+        return cached_pdf
+    async with slots:
+        pdf = await render_executor.render_pdf(build_voucher_html(booking), profile=profile)
+    pdf_cache.put(cache_key, pdf)
+    return pdf
+
+@router.post("/booking-confirmation-batch")
+async def booking_confirmation_batch(data: List[BookingData1], output: str = "zip", size: Optional[str] = None):
+    check_batch_size(len(data))
+    if output not in BATCH_OUTPUTS:
+        raise HTTPException(status_code=400, detail=f"output must be one of {', '.join(BATCH_OUTPUTS)}")
+    profile = pdf_profile(size)
+    try:
+        if output == "pdf":
+            pdf = await render_executor.render_merged_pdf(
+                [build_voucher_html(booking) for booking in data], profile=profile
+            )
+            return Response(
+                content=pdf,
+                media_type="application/pdf",
+                headers={"Content-Disposition": "inline; filename=booking_confirmations.pdf", "X-PDF-Profile": profile}
+            )
+
+        # Keep at most one voucher per render worker in flight so a big batch can't fill the queue
+        slots = asyncio.Semaphore(render_executor.workers)
+        pdfs = await asyncio.gather(*(render_voucher_cached(booking, slots, profile) for booking in data))
+
+        archive = io.BytesIO()
+        # PDFs are already compressed, storing them keeps zipping nearly free
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zip_file:
+            for filename, pdf in zip(batch_filenames(data), pdfs):
+                zip_file.writestr(filename, pdf)
+        return Response(
+            content=archive.getvalue(),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=booking_confirmations.zip", "X-PDF-Profile": profile}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Lifespan hooks, run by main.lifespan when this router is enabled
+async def startup() -> None:
+    # Every render worker lays out the sample vouchers as it starts (see warm_up)
+    if config.WARMUP:
+        render_executor.warmup_html = [build_voucher_html(booking) for booking in warmup_bookings()]
+    # Start the WeasyPrint process pool before serving and drain it on shutdown
+    render_executor.start()
+    await render_jobs.start()
+
+async def warm_up() -> Dict[str, Any]:
+    state = {}
+    # Seed the voucher image cache first so the workers' warm-up renders don't go to S3
+    if config.ASSET_PRELOAD:
+        state["assets"] = await asyncio.to_thread(assets.preload, PDF_TEMPLATES)
+    if config.WARMUP:
+        state["workers"] = await render_executor.warm_up(config.WARMUP_TIMEOUT)
+    return state
+
+async def shutdown() -> None:
+    await render_jobs.stop(drain=config.SERVER_GRACEFUL_TIMEOUT)
+    render_executor.shutdown()
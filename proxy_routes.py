@@ -0,0 +1,169 @@
+from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Any, Optional, Dict
+
+import config
+import fastjson
+import logs
+from resilience import call_upstream
+from upstreams import SEARCH_SUPPLIERS, upstream_clients, cached_search, fanout_search, stream_upstream, token_results
+
+log = logs.get_logger("proxy")
+
+# Bakuun / EaseMyTrip proxy routes. No booking models, templates or renderer: an instance
+# serving only this router (ROUTERS=proxy) starts without any of them.
+router = APIRouter(route_class=fastjson.ORJSONRoute)
+
+@router.get("/test1")
+async def test():
+    response = await upstream_clients.get("httpbin").get("/get")
+    return response.json
+
+# Upstream POST for the proxy routes. In streaming mode (PROXY_STREAMING) bytes go through
+# untouched; otherwise the body is parsed, forwarded as JSON and the answer re-encoded.
+async def proxy_post(request: Request, upstream: str, path: str, log_response: bool = False, search: bool = False):
+    try:
+        raw_body = await request.body()
+        if not raw_body:
+            return {"error": "Request body is empty"}
+        logs.log_body(log, "Request body", raw_body)
+        # Pure searches go through the search cache (identical in-flight ones coalesced, retries
+        # and hedging allowed); everything else may have side effects and is passed straight on
+        if search:
+            return await cached_search(request.url.path, upstream, path, request, raw_body, log_response)
+        if config.PROXY_STREAMING:
+            return await stream_upstream(upstream, "POST", path, request, raw_body)
+        body = fastjson.loads(raw_body)
+        response = await call_upstream(
+            upstream,
+            lambda: upstream_clients.get(upstream).post(
+                path, headers={"Content-Type": "application/json"}, content=fastjson.dumps(body)
+            ),
+            lambda response: response.status_code,
+        )
+        if log_response:
+            # Raw upstream answer for debugging (DEBUG level, sampled and truncated)
+            logs.log_body(log, "Raw response", response.content)
+        # Return the response from the external API; a Response skips FastAPI's jsonable_encoder pass
+        return ORJSONResponse(fastjson.loads(response.content))
+    except HTTPException:
+        # Circuit open (503), latency budget exceeded (504) or upstream unreachable (502)
+        raise
+    except Exception:
+        log.exception("Unexpected error")
+        return {"error": "Unexpected error occurred"}
+
+@router.post("/create")
+async def create_user(request: Request):
+    return await proxy_post(request, "reqres", "/api/users")
+
+@router.post("/getprop")
+async def get_prop(request: Request):
+    return await proxy_post(request, *SEARCH_SUPPLIERS["getprop"], search=True)
+
+@router.post("/mps")
+async def mps_check(request: Request):
+    return await proxy_post(request, *SEARCH_SUPPLIERS["mps"], log_response=True, search=True)
+
+@router.post("/mpslive")
+async def mpslive_check(request: Request):
+    return await proxy_post(request, *SEARCH_SUPPLIERS["mpslive"], log_response=True, search=True)
+
+# One search sent to several suppliers at once, answers streamed back as NDJSON lines
+# ({"supplier", "status", "cache", "elapsed_ms", "data"} or {"supplier", "error", ...})
+@router.post("/search-fanout")
+async def search_fanout(request: Request, suppliers: Optional[str] = None):
+    names = [name.strip() for name in suppliers.split(",") if name.strip()] if suppliers else config.FANOUT_SUPPLIERS
+    unknown = [name for name in names if name not in SEARCH_SUPPLIERS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown suppliers {', '.join(unknown)}; choose from {', '.join(SEARCH_SUPPLIERS)}"
+        )
+    raw_body = await request.body()
+    if not raw_body:
+        raise HTTPException(status_code=400, detail="Request body is empty")
+    return StreamingResponse(fanout_search(list(dict.fromkeys(names)), raw_body), media_type="application/x-ndjson")
+
+#mps search results
+# Token results are read with the pooled async client, so a slow Bakuun call no longer blocks the
+# event loop; ?wait=<seconds> long-polls until the results are ready (see upstreams.token_results)
+async def token_results_response(request: Request, upstream: str, path: str, wait: float):
+    try:
+        raw_body = await request.body()
+        if not raw_body:
+            return {"error": "Request body is empty"}
+        logs.log_body(log, "Request body", raw_body)
+        body = fastjson.loads(raw_body)
+        return ORJSONResponse(await token_results(request.scope["route"].path, upstream, path, body, wait))
+    except HTTPException:
+        raise
+    except Exception:
+        log.exception("Unexpected error")
+        return {"error": "Unexpected error occurred"}
+
+@router.post("/mpsoccupancy/{token}/results")
+async def mps_search(token : str, request: Request, wait: float = 0):
+    return await token_results_response(request, "bakuun_test", f"/v1/RDK64/mpsoccupancy/{token}/results", wait)
+
+@router.post("/sps")
+async def sps(request: Request):
+    return await proxy_post(request, *SEARCH_SUPPLIERS["sps"], search=True)
+
+@router.post("/spslive")
+async def spslive(request: Request):
+    return await proxy_post(request, *SEARCH_SUPPLIERS["spslive"], search=True)
+
+@router.post("/spsoccupancy/{token}/results")
+async def sps_token(token : str, request: Request, wait: float = 0):
+    return await token_results_response(request, "bakuun_test", f"/v1/RDK64/spsoccupancy/{token}/results", wait)
+
+@router.post("/booking")
+async def booking(request: Request):
+    return await proxy_post(request, "bakuun_test", "/v1/booking/test/RDK64/965220")
+
+@router.post("/emtactivity/{action}")
+async def emt_activity(action: str, request: Request):
+    try:
+        if config.PROXY_STREAMING:
+            raw_body = await request.body()
+            if not raw_body:
+                raise HTTPException(status_code=400, detail="Request body is empty or invalid JSON")
+            return await stream_upstream("emt_activity", "POST", f"/Activity.svc/json/{action}", request, raw_body)
+        try:
+            body = await request.json()
+        except Exception:
+            raise HTTPException(status_code=400, detail="Request body is empty or invalid JSON")
+        logs.log_body(log, "Request body", body)
+        upstream_response = await call_upstream(
+            "emt_activity",
+            lambda: upstream_clients.get("emt_activity").post(
+                f"/Activity.svc/json/{action}", headers={"Content-Type": "application/json"}, content=fastjson.dumps(body)
+            ),
+            lambda response: response.status_code,
+        )
+        content = await upstream_response.aread()
+        content_type = upstream_response.headers.get("content-type", "application/octet-stream")
+        return Response(
+            content=content,
+            status_code=upstream_response.status_code,
+            media_type=content_type
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        log.exception("Unexpected error")
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+
+# Lifespan hooks, run by main.lifespan when this router is enabled
+async def startup() -> None:
+    # One pooled client per proxy upstream, reused by every request
+    upstream_clients.start()
+
+async def warm_up() -> Dict[str, Any]:
+    if config.UPSTREAM_PREWARM_CONNECTIONS <= 0:
+        return {}
+    return {"upstreams": await upstream_clients.prewarm(config.UPSTREAM_PREWARM_CONNECTIONS)}
+
+async def shutdown() -> None:
+    await upstream_clients.stop()
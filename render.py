@@ -0,0 +1,306 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+import config
+import logs
+import metrics
+from assets import url_fetcher
+from caching import LRUByteCache, canonical_hash, report_size
+
+# WeasyPrint (and with it Pango, cairo and fontconfig) is imported by the render workers, when
+# the forkserver starts them (see _worker_context), never by the server processes, which only
+# hand HTML to the pool. Importing this module is therefore cheap.
+if TYPE_CHECKING:
+    from weasyprint.text.fonts import FontConfiguration
+
+log = logs.get_logger("render")
+
+# Bump when a code change alters PDF output for the same payload and templates
+RENDER_VERSION = "2"
+
+# Per worker process state, reused by every render that worker performs
+_font_config: Optional["FontConfiguration"] = None
+_image_cache: dict = {}
+
+# write_pdf options per size profile. WeasyPrint already subsets fonts and writes compressed
+# streams in PDF 1.7 object streams (deduplicated images included) by default; the smaller
+# profiles also recompress and downsample the embedded images, "full" embeds whole fonts.
+PDF_PROFILES: Dict[str, Dict[str, Any]] = {
+    "standard": {},
+    "small": {"optimize_images": True, "jpeg_quality": 80, "dpi": 150},
+    "smallest": {"optimize_images": True, "jpeg_quality": 60, "dpi": 96},
+    "full": {"full_fonts": True},
+}
+
+
+def _font_configuration() -> "FontConfiguration":
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+# Pool initializer: build the worker's font configuration and lay out the warm-up vouchers,
+# so the first real render in this worker finds Pango, fonts and images loaded.
+# A failed warm-up render only costs speed, it must not break the pool.
+def _init_worker(warmup_html: Sequence[str] = ()) -> None:
+    logs.configure(background=False)
+    _font_configuration()
+    for html_content in warmup_html:
+        try:
+            generate_pdf_from_html(html_content)
+        except Exception as e:
+            log.warning("Render worker warm-up failed", extra={"pid": os.getpid(), "error": str(e)})
+
+
+# Render workers fork from a forkserver that has already imported this module and WeasyPrint
+# (Pango, cairo and fontconfig with it), so they start with the libraries loaded and share
+# those pages copy-on-write. The forkserver is a fresh single-threaded process, so the workers
+# stay as independent of the server's threads and event loop as with spawn, the fallback.
+def _worker_context():
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__, "weasyprint", "weasyprint.text.fonts"])
+    return context
+
+
+# Runs in a worker once its initializer has finished
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+# The <style> blocks stay in the document: passed as render(stylesheets=...) they would become
+# user-origin sheets and lose to author-level rules such as the presentational hints
+def _html_document(html_content: str):
+    from weasyprint import HTML
+    return HTML(string=html_content, url_fetcher=url_fetcher)
+
+
+def _layout(html, presentational_hints: Optional[bool]):
+    if presentational_hints is None:
+        presentational_hints = config.RENDER_PRESENTATIONAL_HINTS
+    return html.render(
+        font_config=_font_configuration(),
+        presentational_hints=presentational_hints,
+        cache=_image_cache,
+    )
+
+
+def _render_document(html_content: str, presentational_hints: Optional[bool]):
+    return _layout(_html_document(html_content), presentational_hints)
+
+
+# Runs inside a pool worker process, so it must stay a picklable top-level function
+def generate_pdf_from_html(
+    html_content: str, presentational_hints: Optional[bool] = None, profile: str = "standard"
+) -> bytes:
+    return _render_document(html_content, presentational_hints).write_pdf(**PDF_PROFILES[profile])
+
+
+# Same, also reporting how long each WeasyPrint stage took in the worker
+def _generate_pdf_timed(
+    html_content: str, presentational_hints: Optional[bool] = None, profile: str = "standard"
+) -> Tuple[bytes, Dict[str, float]]:
+    timings = {}
+    started = time.perf_counter()
+    html = _html_document(html_content)
+    timings["parse"] = time.perf_counter() - started
+    started = time.perf_counter()
+    document = _layout(html, presentational_hints)
+    timings["layout"] = time.perf_counter() - started
+    started = time.perf_counter()
+    pdf = document.write_pdf(**PDF_PROFILES[profile])
+    timings["write"] = time.perf_counter() - started
+    return pdf, timings
+
+
+# One PDF with the pages of every voucher, in order. Laid-out documents can't leave the
+# worker process, so a merged PDF is produced by a single worker.
+def generate_merged_pdf(
+    html_contents: List[str], presentational_hints: Optional[bool] = None, profile: str = "standard"
+) -> bytes:
+    documents = [_render_document(html_content, presentational_hints) for html_content in html_contents]
+    pages = [page for document in documents for page in document.pages]
+    return documents[0].copy(pages).write_pdf(**PDF_PROFILES[profile])
+
+
+class RenderExecutor:
+    # Process pool for WeasyPrint renders with a bounded queue and per-render timeouts.
+    # A render that times out keeps its slot until the worker actually finishes it,
+    # so stuck renders can never push the pool past workers + queue_size.
+
+    def __init__(self, workers: int, queue_size: int, timeout: float):
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self.timeout = timeout
+        self.in_flight = 0
+        # Rendered by every worker as it starts, including replacements after a crash
+        self.warmup_html: List[str] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Woken whenever a render gives its slot back (see wait_for_slot)
+        self._slot_waiters: List[asyncio.Future] = []
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=_worker_context(),
+                initializer=_init_worker,
+                initargs=(tuple(self.warmup_html),),
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        waiters, self._slot_waiters = self._slot_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    # For callers that would rather wait than get a 503: returns once the queue has room. Another
+    # caller may still take the slot first, so submit can raise 503 again and the caller waits again.
+    async def wait_for_slot(self) -> None:
+        while self.in_flight >= self.capacity:
+            waiter = asyncio.get_running_loop().create_future()
+            self._slot_waiters.append(waiter)
+            await waiter
+
+    async def submit(self, fn, *args, timeout: Optional[float] = None):
+        timeout = timeout or self.timeout
+        if self._pool is None:
+            self.start()
+        if self.in_flight >= self.capacity:
+            raise HTTPException(status_code=503, detail="Render queue is full, retry shortly")
+
+        loop = asyncio.get_running_loop()
+        # Every render in flight on a crashed pool sees BrokenProcessPool; only the first may restart it
+        pool = self._pool
+        self.in_flight += 1
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._restart(pool)
+            raise HTTPException(status_code=500, detail="PDF generation failed: render pool restarted")
+        except BaseException:
+            # No future, so no done callback will ever give the slot back
+            self._release()
+            raise
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"PDF generation timed out after {timeout:g}s")
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise HTTPException(status_code=500, detail="PDF generation failed: render worker crashed")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        # Already replaced: shutting the new pool down would cancel renders submitted since
+        if self._pool is not broken:
+            return
+        self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    async def warm_up(self, timeout: float) -> int:
+        # Workers are spawned on demand, so keep handing out tiny tasks until every worker has
+        # answered; a worker only takes a task once its initializer (the warm-up renders) is done.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        ready = set()
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise HTTPException(
+                    status_code=504, detail=f"{len(ready)} of {self.workers} render workers warmed up in {timeout:g}s"
+                )
+            pids = await asyncio.gather(*(
+                self.submit(_worker_pid, timeout=remaining) for _ in range(self.workers - len(ready))
+            ))
+            ready.update(pids)
+            if len(ready) >= self.workers:
+                return len(ready)
+            await asyncio.sleep(0.1)
+
+    async def render_pdf(
+        self, html_content: str, presentational_hints: Optional[bool] = None, timeout: Optional[float] = None,
+        profile: str = "standard",
+    ) -> bytes:
+        # "render" is the whole wait, queueing in the pool included
+        with metrics.timed("render"):
+            pdf, timings = await self.submit(
+                _generate_pdf_timed, html_content, presentational_hints, profile, timeout=timeout
+            )
+        for stage, seconds in timings.items():
+            metrics.observe_stage(stage, seconds)
+        metrics.PDF_BYTES.observe(len(pdf), profile=profile)
+        return pdf
+
+    async def render_merged_pdf(
+        self, html_contents: List[str], presentational_hints: Optional[bool] = None, profile: str = "standard"
+    ) -> bytes:
+        # Budget the usual per-voucher timeout for each voucher in the merged document
+        with metrics.timed("render"):
+            pdf = await self.submit(
+                generate_merged_pdf, html_contents, presentational_hints, profile,
+                timeout=self.timeout * max(1, len(html_contents)),
+            )
+        metrics.PDF_BYTES.observe(len(pdf), profile=profile)
+        return pdf
+
+
+render_executor = RenderExecutor(
+    workers=config.RENDER_WORKERS,
+    queue_size=config.RENDER_QUEUE_SIZE,
+    timeout=config.RENDER_TIMEOUT,
+)
+
+
+# Finished PDFs keyed by what produced them; also used as the response ETag
+pdf_cache = LRUByteCache(config.PDF_CACHE_MAX_BYTES, name="pdf")
+report_size("pdf", pdf_cache)
+
+metrics.Callback(
+    "render_in_flight", "Renders submitted to the worker pool and not finished (running + queued)", "gauge",
+    lambda: {(): render_executor.in_flight},
+)
+metrics.Callback(
+    "render_queue_depth", "Renders waiting for a free worker", "gauge",
+    lambda: {(): max(0, render_executor.in_flight - render_executor.workers)},
+)
+
+
+# Size profile of a request: ?size=... when given, else PDF_SIZE_PROFILE
+def pdf_profile(requested: Optional[str] = None) -> str:
+    profile = requested or config.PDF_SIZE_PROFILE
+    if profile not in PDF_PROFILES:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown PDF size profile {profile}; use one of {', '.join(PDF_PROFILES)}"
+        )
+    return profile
+
+
+def pdf_cache_key(route: str, data, template_version: str, profile: str = "standard") -> str:
+    # "standard" keeps the keys (and ETags) PDFs had before size profiles existed
+    if profile == "standard":
+        return canonical_hash(RENDER_VERSION, route, template_version, data)
+    return canonical_hash(RENDER_VERSION, route, template_version, profile, data)
@@ -0,0 +1,202 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import httpx
+from fastapi import HTTPException
+
+import config
+import logs
+import metrics
+
+log = logs.get_logger("resilience")
+
+# Guards every upstream call: a latency budget per upstream, a circuit breaker that fails fast
+# while an upstream keeps failing, and for idempotent routes optional retries with jitter and
+# hedged requests. A degraded supplier then costs a quick 503/504 instead of piling up requests
+# until the worker runs out of connections.
+
+T = TypeVar("T")
+
+# Upstream answers worth another try on an idempotent route
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+
+class CircuitBreaker:
+    # closed -> open after `failures` consecutive failures; after `reset` seconds one trial call
+    # is let through (half-open): success closes the circuit, failure opens it again
+
+    def __init__(self, name: str, failures: int, reset: float):
+        self.name = name
+        self.failures = failures
+        self.reset = reset
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset else "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        # A trial that never reported back (cancelled request) is given up after `reset` seconds
+        now = time.monotonic()
+        if state == "half-open" and (self._trial_started is None or now - self._trial_started >= self.reset):
+            self._trial_started = now
+            return
+        retry_after = max(1, int(self.reset - (time.monotonic() - self.opened_at)))
+        raise HTTPException(
+            status_code=503,
+            detail=f"Upstream {self.name} is unavailable, retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._trial_started is not None or self.consecutive_failures >= self.failures:
+            if self.opened_at is None:
+                log.warning("Circuit opened", extra={"upstream": self.name, "failures": self.consecutive_failures})
+            self.opened_at = time.monotonic()
+        self._trial_started = None
+
+
+class LatencyTracker:
+    # Recent call durations of one upstream; its p95 is the hedging delay
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < 20:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+
+
+def breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, config.CIRCUIT_FAILURES, config.CIRCUIT_RESET)
+    return _breakers[name]
+
+
+def latency(name: str) -> LatencyTracker:
+    if name not in _latencies:
+        _latencies[name] = LatencyTracker()
+    return _latencies[name]
+
+
+def hedge_delay(name: str) -> float:
+    p95 = latency(name).p95()
+    return max(p95, config.HEDGE_MIN_DELAY) if p95 is not None else config.HEDGE_DELAY
+
+
+# Start a second copy of the call if the first hasn't answered after `delay`; first answer wins
+async def hedged(attempt: Callable[[], Awaitable[T]], delay: float) -> T:
+    tasks = {asyncio.ensure_future(attempt())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.add(asyncio.ensure_future(attempt()))
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # One copy failing is fine as long as the other still answers
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+            if not pending:
+                return done.pop().result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_upstream(
+    name: str,
+    attempt: Callable[[], Awaitable[T]],
+    status_of: Callable[[T], int],
+    route: Optional[str] = None,
+    idempotent: bool = False,
+) -> T:
+    circuit = breaker(name)
+    try:
+        circuit.before_call()
+    except HTTPException:
+        metrics.UPSTREAM_ERRORS.inc(upstream=name, reason="circuit_open")
+        raise
+    # Labelled by route template (the caller's, or the request's), never by raw path
+    label = route or logs.route_var.get() or ""
+    budget = config.UPSTREAM_BUDGETS.get(name, config.UPSTREAM_BUDGET)
+    retries = config.RETRY_ROUTES.get(route, 0) if idempotent else 0
+    hedge = idempotent and route in config.HEDGE_ROUTES
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+
+    for attempt_number in range(retries + 1):
+        started = loop.time()
+        try:
+            call = hedged(attempt, hedge_delay(name)) if hedge else attempt()
+            result = await asyncio.wait_for(call, deadline - started)
+        except asyncio.TimeoutError:
+            _observe(name, label, loop.time() - started, "timeout")
+            circuit.record_failure()
+            raise HTTPException(status_code=504, detail=f"Upstream {name} did not answer within {budget:g}s")
+        except httpx.TransportError as e:
+            _observe(name, label, loop.time() - started, "transport")
+            circuit.record_failure()
+            if not await _backoff(attempt_number, retries, deadline):
+                raise HTTPException(status_code=502, detail=f"Upstream {name} failed: {e!r}")
+            continue
+
+        status_code = status_of(result)
+        _observe(name, label, loop.time() - started, "status_5xx" if status_code >= 500 else None)
+        if status_code >= 500:
+            circuit.record_failure()
+        else:
+            circuit.record_success()
+            latency(name).record(loop.time() - started)
+        if status_code in RETRYABLE_STATUSES and await _backoff(attempt_number, retries, deadline):
+            continue
+        return result
+    raise RuntimeError("unreachable")
+
+
+def _observe(name: str, route: str, seconds: float, error: Optional[str]) -> None:
+    metrics.UPSTREAM_SECONDS.observe(seconds, upstream=name, route=route)
+    metrics.add_server_timing("upstream", seconds)
+    if error:
+        metrics.UPSTREAM_ERRORS.inc(upstream=name, reason=error)
+
+
+# Sleep before the next retry (full jitter); False when out of retries or out of budget
+async def _backoff(attempt_number: int, retries: int, deadline: float) -> bool:
+    if attempt_number >= retries:
+        return False
+    delay = random.uniform(0, config.RETRY_BACKOFF * 2 ** attempt_number)
+    if asyncio.get_running_loop().time() + delay >= deadline:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+def circuit_states() -> Dict[str, str]:
+    return {name: circuit.state for name, circuit in _breakers.items()}
@@ -0,0 +1,122 @@
+# Production entry point: python serve.py
+#
+# Runs the app under Hypercorn with SERVER_WORKERS server processes sharing one listening
+# socket. With SERVER_PRELOAD the app is imported and its templates built once, here, and the
+# server processes are forked from this process, so they share that memory copy-on-write
+# instead of each importing everything again (Hypercorn's own --workers spawns fresh
+# interpreters, and marks them daemonic, which would stop them from starting a render pool).
+# A server process that dies is replaced. SIGTERM / SIGINT stop accepting connections and
+# drain in-flight requests and render jobs (SERVER_GRACEFUL_TIMEOUT, lifespan in main.py).
+import importlib
+import multiprocessing
+import signal
+import sys
+import time
+from typing import Any, Callable
+
+from hypercorn.config import Config
+
+import config
+import logs
+
+log = logs.get_logger("serve")
+
+SERVER_LOOPS = ("auto", "asyncio", "uvloop")
+
+
+def worker_class() -> str:
+    if config.SERVER_LOOP not in SERVER_LOOPS:
+        raise ValueError(f"SERVER_LOOP must be one of {', '.join(SERVER_LOOPS)}")
+    if config.SERVER_LOOP != "auto":
+        return config.SERVER_LOOP
+    try:
+        import uvloop  # noqa: F401
+    except ImportError:
+        return "asyncio"
+    return "uvloop"
+
+
+def hypercorn_config() -> Config:
+    server = Config()
+    server.application_path = "main:app"
+    server.bind = [config.SERVER_BIND]
+    server.workers = config.SERVER_WORKERS
+    server.worker_class = worker_class()
+    server.graceful_timeout = config.SERVER_GRACEFUL_TIMEOUT
+    # The lifespan shutdown drains render jobs for up to SERVER_GRACEFUL_TIMEOUT, then waits for
+    # the renders still running in the pool
+    server.shutdown_timeout = config.SERVER_GRACEFUL_TIMEOUT + config.RENDER_TIMEOUT + 10
+    return server
+
+
+def worker_function(worker_class: str) -> Callable:
+    if worker_class == "uvloop":
+        from hypercorn.asyncio.run import uvloop_worker
+        return uvloop_worker
+    from hypercorn.asyncio.run import asyncio_worker
+    return asyncio_worker
+
+
+def main() -> int:
+    # Direct writes: no logging thread may be running when the server processes are forked
+    logs.configure(background=False)
+    server = hypercorn_config()
+    sockets = server.create_sockets()
+    if config.SERVER_PRELOAD:
+        variants = importlib.import_module("main").preload()
+        log.info("App preloaded", extra={"variants": variants})
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context("spawn")
+    worker = worker_function(server.worker_class)
+    shutdown_event = context.Event()
+
+    def start_worker():
+        process = context.Process(
+            target=worker, kwargs={"config": server, "sockets": sockets, "shutdown_event": shutdown_event}
+        )
+        process.start()
+        return process
+
+    # Server processes inherit SIGINT ignored: only this process reacts to signals and tells them via shutdown_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    processes = [start_worker() for _ in range(server.workers)]
+    log.info(
+        "Server started",
+        extra={
+            "bind": server.bind,
+            "workers": server.workers,
+            "render_workers": config.RENDER_WORKERS,
+            "loop": server.worker_class,
+            "preload": config.SERVER_PRELOAD,
+        },
+    )
+
+    # Only a flag here: setting the event from a signal handler can deadlock on its lock
+    stopping = False
+
+    def shutdown(*_: Any) -> None:
+        nonlocal stopping
+        stopping = True
+
+    for signal_name in ("SIGINT", "SIGTERM"):
+        signal.signal(getattr(signal, signal_name), shutdown)
+
+    while not stopping:
+        time.sleep(1)
+        for i, process in enumerate(processes):
+            if not stopping and not process.is_alive():
+                log.warning("Server process exited, replacing it", extra={"pid": process.pid, "exitcode": process.exitcode})
+                processes[i] = start_worker()
+
+    shutdown_event.set()
+    log.info("Shutting down, draining requests", extra={"graceful_timeout": server.graceful_timeout})
+    for process in processes:
+        process.join()
+    for sock in [*sockets.secure_sockets, *sockets.insecure_sockets]:
+        sock.close()
+    return 0 if all(process.exitcode == 0 for process in processes) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
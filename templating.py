@@ -0,0 +1,260 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+import config
+import metrics
+
+# Placeholders look like {{name}} but the templates are hand edited, so spacing and case
+# drift ({{ booking_id }}, {{BRID}} vs {{Brid}}). Slot names are normalised to lowercase
+# with surrounding spaces removed before they are looked up here.
+_SLOT_RE = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+# Template slot -> booking model field. GUESTTABLE is not a field, it is built per request.
+SLOT_FIELDS: Dict[str, str] = {
+    "name": "NAME",
+    "checkindate": "CHECKIN",
+    "checkoutdate": "CHECKOUT",
+    "dayofcheckin": "DAYOF_CHECKIN",
+    "dayofcheckout": "DAYOF_CHECKOUT11",
+    "no_of_night": "NO_OF_NIGHTS",
+    "checkintime": "CHECK_IN_TIME",
+    "checkouttime": "CHECK_OUT_TIME",
+    "hotelname": "HOTELNAME",
+    "hoteladdress": "HOTELADDRESS",
+    "hotelphone": "HOTELPHONE",
+    "noofrooms": "ROOMCOUNT",
+    "noofguest": "GUESTCOUNT",
+    "roomcharges": "ROOM_CHARGES",
+    "inclusions": "INCLUSIONS",
+    "gst": "GST_VALUE",
+    "subtotal": "SUBTOTAL",
+    "grandtotal": "AMT_TO_BE_PAID",
+    "paymentmode": "PAYMENTMODE",
+    "addon_polices": "ADDON_POLICES",
+    "default_polices": "DEFAULT_POLICES",
+    "cancellationpolicy": "CANCELLATIONPOLICY",
+    "empname": "EMPNAME",
+    "empphone": "EMPPHONE",
+    "empemail": "EMPEMAIL",
+    "location": "LOCATIONLINK",
+    "client": "CLIENT",
+    "clientgst": "CLIENT_GST",
+    "booking_date": "Booking_Date",
+    "booking_id": "Booking_Id",
+    "brid": "Brid",
+    "gstpre": "GST_PRECENT",
+    "gst_precent": "GST_PRECENT",
+    "nearby": "NEARBY",
+}
+GUEST_TABLE_SLOT = "guesttable"
+KNOWN_SLOTS = frozenset(SLOT_FIELDS) | {GUEST_TABLE_SLOT}
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    # A template split once into static text and named slots; render is a single join
+
+    def __init__(self, source: str, known_slots=KNOWN_SLOTS):
+        self.statics: List[str] = []
+        self.slots: List[str] = []
+        position = 0
+        for match in _SLOT_RE.finditer(source):
+            slot = match.group(1).lower()
+            if slot not in known_slots:
+                raise TemplateError(f"Unknown template slot {match.group(0)!r}")
+            self.statics.append(source[position:match.start()])
+            self.slots.append(slot)
+            position = match.end()
+        self.statics.append(source[position:])
+
+        # Anything still looking like a placeholder would otherwise end up in a voucher verbatim
+        for static in self.statics:
+            if "{{" in static:
+                snippet = static[static.index("{{"):][:40]
+                raise TemplateError(f"Malformed template placeholder near {snippet!r}")
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = [""] * (len(self.statics) + len(self.slots))
+        parts[0::2] = self.statics
+        parts[1::2] = [values.get(slot, "") for slot in self.slots]
+        return "".join(parts)
+
+
+# Voucher templates rendered to PDF, and the mail HTML templates
+PDF_TEMPLATES = ["voucher.html", "Bulkvoucher.html"]
+MAIL_TEMPLATES = ["voucherMail.html", "BulkVoucherMail.html"]
+
+
+@lru_cache(maxsize=None)
+def get_html_template(template_name: str) -> str:
+    try:
+        with open(template_name, "r") as file:
+            return file.read()
+    except FileNotFoundError:
+        raise HTTPException(status_code=500, detail=f"Template file {template_name} not found")
+
+
+# Mail templates are hand indented and full of commented-out blocks. Email clients collapse
+# whitespace anyway, so runs of it become one space and plain comments are dropped, once per
+# template. Outlook conditional comments (<!--[if mso]>) and <pre>/<textarea> are kept as they are.
+_COMMENT_RE = re.compile(r"<!--(?!\[if)(?!<!).*?-->", re.DOTALL)
+_PRESERVE_RE = re.compile(r"(<(pre|textarea)\b.*?</\2>)", re.IGNORECASE | re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def minify_html(source: str) -> str:
+    parts = _PRESERVE_RE.split(_COMMENT_RE.sub("", source))
+    # split() yields [text, preserved block, tag name, text, ...]
+    for i in range(0, len(parts), 3):
+        parts[i] = _WHITESPACE_RE.sub(" ", parts[i])
+    del parts[2::3]
+    return "".join(parts).strip()
+
+
+# Conditional regions of the voucher templates are declared as named sections:
+#     <!--section:NAME-->markup<!--/section:NAME-->
+#     <!--section:NAME-->markup<!--else:NAME-->alternative<!--/section:NAME-->
+# Every template declares every section in VARIANT_SECTIONS. For each (template, variant) the
+# sections are resolved once into a plain template (see template_variant), so a request only
+# picks a prebuilt text. A missing, misspelt or unbalanced marker raises TemplateError when the
+# variants are built at startup instead of silently leaving a section in every voucher.
+_SECTION_RE = re.compile(r"<!--section:(\w+)-->(.*?)(?:<!--else:\1-->(.*?))?<!--/section:\1-->", re.DOTALL)
+_SECTION_NAME_RE = re.compile(r"<!--section:(\w+)-->")
+_MARKER_RE = re.compile(r"<!--/?(?:section|else):\w*-->")
+
+# Payment mode -> payment class; any other mode is "other" (tariff always shown, no pay-at-hotel wording)
+PAYMENT_CLASSES: Dict[str, str] = {
+    "Bill to Company": "company",
+    "Pay at Check-In": "hotel",
+    "Pay at check Out": "hotel",
+    "Prepaid": "hotel",
+}
+
+
+class TemplateVariant(NamedTuple):
+    payment: str
+    tariff: bool
+    policies: bool
+
+
+VARIANTS = tuple(
+    TemplateVariant(payment, tariff, policies)
+    for payment in ("company", "hotel", "other")
+    for tariff in (True, False)
+    for policies in (True, False)
+)
+
+
+def booking_variant(data) -> TemplateVariant:
+    payment = PAYMENT_CLASSES.get(getattr(data, "PAYMENTMODE", None), "other")
+    return TemplateVariant(
+        payment=payment,
+        # SHOWTRAIFF=No only hides the tariff for the known payment modes
+        tariff=payment == "other" or getattr(data, "SHOWTRAIFF", None) != "No",
+        policies=bool(getattr(data, "ADDON_POLICES", None) or getattr(data, "DEFAULT_POLICES", None)),
+    )
+
+
+# The original /booking-confirmation and /booking-confirmation-mail endpoints keep the output they
+# always had: the PDF only hides the tariff and an empty policies block (GRAND TOTAL wording and the
+# extra-charges note stay), the mail hides nothing
+def legacy_pdf_variant(data) -> TemplateVariant:
+    return booking_variant(data)._replace(payment="other")
+
+
+LEGACY_MAIL_VARIANT = TemplateVariant(payment="other", tariff=True, policies=True)
+
+
+# Section name -> shown for a variant (otherwise its else-branch, or nothing, is used)
+VARIANT_SECTIONS: Dict[str, Callable[[TemplateVariant], bool]] = {
+    "tariff": lambda variant: variant.tariff,
+    # "Total Amount to pay" instead of "GRAND TOTAL", and no extra-charges note, when paid at the hotel
+    "grand_total": lambda variant: variant.payment != "hotel",
+    "extra_charges_note": lambda variant: variant.payment != "hotel",
+    "policies": lambda variant: variant.policies,
+}
+
+
+def resolve_sections(source: str, variant: TemplateVariant, template_name: str = "template") -> str:
+    declared = set(_SECTION_NAME_RE.findall(source))
+    unknown = declared - set(VARIANT_SECTIONS)
+    if unknown:
+        raise TemplateError(f"{template_name}: unknown template sections {sorted(unknown)}")
+    missing = set(VARIANT_SECTIONS) - declared
+    if missing:
+        raise TemplateError(f"{template_name}: template sections {sorted(missing)} are not declared")
+
+    def resolve(match: re.Match) -> str:
+        name, shown, alternative = match.groups()
+        chosen = shown if VARIANT_SECTIONS[name](variant) else alternative or ""
+        # Sections may be nested (grand_total sits inside tariff)
+        return _SECTION_RE.sub(resolve, chosen)
+
+    resolved = _SECTION_RE.sub(resolve, source)
+    leftover = _MARKER_RE.search(resolved)
+    if leftover:
+        raise TemplateError(f"{template_name}: unbalanced template section marker {leftover.group(0)!r}")
+    return resolved
+
+
+# One voucher or mail template with its sections resolved for a variant; mail variants are minified
+@lru_cache(maxsize=None)
+def template_variant(template_name: str, variant: TemplateVariant, mail: bool = False) -> str:
+    source = resolve_sections(get_html_template(template_name), variant, template_name)
+    return minify_html(source) if mail and config.MAIL_MINIFY else source
+
+
+# Build and compile every variant of every template, so a broken template fails the deploy
+def prebuild_variants(pdf_templates: Iterable[str], mail_templates: Iterable[str]) -> int:
+    built = set()
+    for mail, template_names in ((False, pdf_templates), (True, mail_templates)):
+        for template_name in template_names:
+            for variant in VARIANTS:
+                source = template_variant(template_name, variant, mail)
+                compile_template(source)
+                built.add(source)
+    return len(built)
+
+
+# Changes whenever one of the given template files changes, so cached renders never outlive their markup
+@lru_cache(maxsize=None)
+def template_version(*template_names: str) -> str:
+    digest = hashlib.sha256()
+    for template_name in template_names:
+        digest.update(get_html_template(template_name).encode())
+    return digest.hexdigest()[:16]
+
+
+# Keyed by template text, so variants produced by section removal are compiled once each
+@lru_cache(maxsize=256)
+def compile_template(source: str) -> CompiledTemplate:
+    return CompiledTemplate(source)
+
+
+# Build every slot value once from a booking model; missing fields render as empty strings
+def booking_context(data, guest_table: Optional[str] = "") -> Dict[str, str]:
+    values = {}
+    for slot, field in SLOT_FIELDS.items():
+        value = getattr(data, field, None)
+        values[slot] = str(value) if value is not None else ""
+    values[GUEST_TABLE_SLOT] = guest_table or ""
+    return values
+
+
+# context: slot values already built for this booking, so the PDF and the mail of one
+# booking share them (see the bundle endpoint); only the guest table differs between the two
+@metrics.timed("template_fill")
+def fill_template(source: str, data, guest_table: Optional[str] = "", context: Optional[Dict[str, str]] = None) -> str:
+    if context is None:
+        values = booking_context(data, guest_table)
+    else:
+        values = dict(context)
+        values[GUEST_TABLE_SLOT] = guest_table or ""
+    return compile_template(source).render(values)
@@ -0,0 +1,331 @@
+import asyncio
+import gzip
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+import config
+import fastjson
+import logs
+import metrics
+from caching import LRUByteCache, SingleFlight, canonical_hash, report_size
+from compression import accepts
+from resilience import call_upstream
+
+log = logs.get_logger("upstreams")
+
+# The proxy routes used to open a new httpx.AsyncClient per request, paying DNS, TCP and TLS
+# to the same few hosts every time. Each upstream now gets one long-lived client whose
+# connection pool is shared by every request, opened in the app lifespan and closed with it.
+UPSTREAMS: Dict[str, str] = {
+    "reqres": "https://reqres.in",
+    "bakuun_property": "https://wsb.devbakuun.cloud",
+    "bakuun_test": "https://wspull.devbakuun.cloud",
+    "bakuun_live": "https://wspull.bakuun.com",
+    "emt_activity": "http://stagingactivityapi.easemytrip.com",
+    "httpbin": "https://httpbin.org",
+}
+
+# Search suppliers, named after their proxy routes: name -> (upstream, path)
+SEARCH_SUPPLIERS: Dict[str, Tuple[str, str]] = {
+    "mps": ("bakuun_test", "/v1/mpsoccupancy/test/RDK64/615890"),
+    "mpslive": ("bakuun_live", "/v1/mpsnight/MPB5/223004"),
+    "sps": ("bakuun_test", "/v1/spsoccupancy/test/RDK64/647936"),
+    "spslive": ("bakuun_live", "/v1/spsnight/MPB5/646607"),
+    "getprop": ("bakuun_property", "/v2/getproperty/test/RDK64/139658"),
+}
+
+
+class UpstreamClients:
+
+    def __init__(self, base_urls: Dict[str, str]):
+        self.base_urls = base_urls
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, base_url: str) -> httpx.AsyncClient:
+        options = dict(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=config.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=config.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=config.UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                config.UPSTREAM_READ_TIMEOUT,
+                connect=config.UPSTREAM_CONNECT_TIMEOUT,
+                pool=config.UPSTREAM_POOL_TIMEOUT,
+            ),
+        )
+        if config.UPSTREAM_HTTP2:
+            try:
+                return httpx.AsyncClient(http2=True, **options)
+            except ImportError as e:
+                # HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+                log.warning("HTTP/2 unavailable, using HTTP/1.1", extra={"base_url": base_url, "error": str(e)})
+        return httpx.AsyncClient(**options)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(self.base_urls[name])
+        return client
+
+    def start(self) -> None:
+        for name in self.base_urls:
+            self.get(name)
+
+    async def _prewarm_one(self, name: str, connections: int) -> bool:
+        # Any response, even a 404, leaves a connection (and its TLS session) in the pool
+        client = self.get(name)
+        results = await asyncio.gather(
+            *(client.head("/") for _ in range(connections)), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            log.warning("Upstream prewarm failed", extra={"base_url": self.base_urls[name], "error": repr(errors[0])})
+        return len(errors) < len(results)
+
+    # Open connections to every upstream so the first proxied call doesn't pay for the handshake
+    async def prewarm(self, connections: int) -> Dict[str, bool]:
+        names = list(self.base_urls)
+        results = await asyncio.gather(*(self._prewarm_one(name, connections) for name in names))
+        return dict(zip(names, results))
+
+    async def stop(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+upstream_clients = UpstreamClients(UPSTREAMS)
+
+
+# Upstream headers that describe the body and are passed on as they are; connection and
+# framing headers belong to each hop
+_PASSTHROUGH_HEADERS = ("content-type", "content-encoding", "content-length", "cache-control", "etag", "last-modified")
+
+
+# Raw pass-through: the request bytes go upstream unparsed and the upstream body comes back
+# chunk by chunk with its own status and headers. The client's Accept-Encoding is forwarded,
+# so a gzip answer is relayed still compressed instead of being inflated and re-encoded here.
+async def stream_upstream(name: str, method: str, path: str, request: Request, content: bytes) -> StreamingResponse:
+    client = upstream_clients.get(name)
+    upstream_request = client.build_request(
+        method,
+        path,
+        content=content,
+        headers={
+            "Content-Type": request.headers.get("content-type", "application/json"),
+            "Accept": request.headers.get("accept", "*/*"),
+            "Accept-Encoding": request.headers.get("accept-encoding", "identity"),
+        },
+    )
+    # Not idempotent in general (bookings), so never retried or hedged
+    response = await call_upstream(
+        name, lambda: client.send(upstream_request, stream=True), lambda response: response.status_code
+    )
+    headers = {header: response.headers[header] for header in _PASSTHROUGH_HEADERS if header in response.headers}
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=headers,
+        background=BackgroundTask(response.aclose),
+    )
+
+
+# Search responses (/mps, /sps, /getprop and the live variants) are cached by route and request
+# body. Entries are fresh for the route's TTL, then served stale for up to its stale window while
+# one background call refreshes them. Concurrent identical searches share one upstream call.
+# entry: (stored_at, content_type, content_encoding, body) - body kept as the upstream sent it
+SearchEntry = Tuple[float, str, str, bytes]
+
+search_cache = LRUByteCache(config.SEARCH_CACHE_MAX_BYTES, sizeof=lambda entry: len(entry[3]) + 256)
+report_size("search", search_cache)
+_search_flights = SingleFlight()
+
+
+def search_cache_key(name: str, path: str, content: bytes) -> str:
+    # Same search with different key order or spacing is the same entry
+    try:
+        body = fastjson.loads(content)
+    except ValueError:
+        body = content.decode("utf-8", "replace")
+    return canonical_hash(name, path, body)
+
+
+async def _fetch_search_once(name: str, path: str, content: bytes) -> Tuple[int, SearchEntry]:
+    # Always ask for gzip: entries take less memory and most clients accept it as-is
+    client = upstream_clients.get(name)
+    upstream_request = client.build_request(
+        "POST",
+        path,
+        content=content,
+        headers={"Content-Type": "application/json", "Accept": "application/json", "Accept-Encoding": "gzip"},
+    )
+    response = await client.send(upstream_request, stream=True)
+    try:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    entry = (
+        time.time(),
+        response.headers.get("content-type", "application/json"),
+        response.headers.get("content-encoding", ""),
+        body,
+    )
+    return response.status_code, entry
+
+
+async def _fetch_search(key: str, route: str, name: str, path: str, content: bytes) -> Tuple[int, SearchEntry]:
+    # Searches are idempotent, so the route's retries and hedging apply
+    status_code, entry = await call_upstream(
+        name, lambda: _fetch_search_once(name, path, content), lambda result: result[0], route=route, idempotent=True
+    )
+    # Only successful answers are worth repeating
+    if status_code == 200 and route in config.SEARCH_CACHE_TTLS:
+        search_cache.put(key, entry)
+    return status_code, entry
+
+
+# Background refresh of a stale entry; a search arriving meanwhile joins it like any other flight
+async def _refresh_search(key: str, route: str, name: str, path: str, content: bytes) -> Tuple[int, SearchEntry]:
+    try:
+        return await _fetch_search(key, route, name, path, content)
+    except Exception as e:
+        log.warning("Search cache refresh failed", extra={"upstream": name, "path": path, "error": str(e)})
+        raise
+
+
+def _search_response(request: Request, status_code: int, entry: SearchEntry, cache_status: str) -> Response:
+    stored_at, content_type, content_encoding, body = entry
+    # Whether the body goes out gzipped depends on Accept-Encoding, so shared caches must key on it
+    headers = {"X-Cache": cache_status, "Age": str(int(time.time() - stored_at)), "Vary": "Accept-Encoding"}
+    if content_encoding == "gzip" and not accepts(request.headers.get("accept-encoding", ""), "gzip"):
+        body = gzip.decompress(body)
+    elif content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, status_code=status_code, media_type=content_type, headers=headers)
+
+
+# One search through the cache: (status code, entry, X-Cache value). Routes without a cache TTL
+# are not cached, but identical concurrent calls are still coalesced.
+async def search(route: str, name: str, path: str, content: bytes) -> Tuple[int, SearchEntry, str]:
+    key = search_cache_key(name, path, content)
+    ttl, stale = config.SEARCH_CACHE_TTLS.get(route, (0, 0))
+    entry: Optional[SearchEntry] = search_cache.get(key) if ttl > 0 else None
+    if entry is not None:
+        age = time.time() - entry[0]
+        if age < ttl:
+            metrics.CACHE_REQUESTS.inc(cache="search", result="hit")
+            return 200, entry, "HIT"
+        if age < ttl + stale:
+            if key not in _search_flights:
+                _search_flights.start(key, lambda: _refresh_search(key, route, name, path, content))
+            metrics.CACHE_REQUESTS.inc(cache="search", result="stale")
+            return 200, entry, "STALE"
+
+    cache_status = "COALESCED" if key in _search_flights else "MISS"
+    metrics.CACHE_REQUESTS.inc(cache="search", result=cache_status.lower())
+    status_code, entry = await _search_flights.run(key, lambda: _fetch_search(key, route, name, path, content))
+    return status_code, entry, cache_status
+
+
+async def cached_search(
+    route: str, name: str, path: str, request: Request, content: bytes, log_response: bool = False
+) -> Response:
+    status_code, entry, cache_status = await search(route, name, path, content)
+    # Raw upstream answer for debugging (DEBUG level, sampled and truncated); only unzipped when logged
+    if log_response and logs.enabled(log, logging.DEBUG):
+        body = gzip.decompress(entry[3]) if entry[2] == "gzip" else entry[3]
+        logs.log_body(log, "Raw response", body)
+    return _search_response(request, status_code, entry, cache_status)
+
+
+# Multi-supplier search: the same body goes to every supplier at once and each answer is
+# yielded as one NDJSON line as soon as it arrives, so the caller waits for the slowest
+# supplier instead of the sum of all of them. A supplier past its deadline or failing
+# becomes an error line; it never holds up the others.
+async def fanout_search(suppliers: List[str], content: bytes) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def one(supplier: str) -> bytes:
+        upstream, path = SEARCH_SUPPLIERS[supplier]
+        deadline = config.FANOUT_DEADLINES.get(supplier, config.FANOUT_DEADLINE)
+        head = {"supplier": supplier}
+        try:
+            status_code, entry, cache_status = await asyncio.wait_for(
+                search(f"/{supplier}", upstream, path, content), deadline
+            )
+        except asyncio.TimeoutError:
+            head["error"] = f"No answer within {deadline:g}s"
+        except HTTPException as e:
+            head.update(status=e.status_code, error=e.detail)
+        except Exception as e:
+            head["error"] = f"Upstream call failed: {e}"
+        head["elapsed_ms"] = round((loop.time() - started) * 1000, 1)
+        if "error" in head:
+            return fastjson.dumps(head) + b"\n"
+
+        _, content_type, content_encoding, body = entry
+        head.update(status=status_code, cache=cache_status)
+        if content_encoding == "gzip":
+            body = gzip.decompress(body)
+        if "json" not in content_type:
+            head["error"] = f"Upstream answered {content_type or 'without a content type'}"
+            head["body"] = body.decode("utf-8", "replace")
+            return fastjson.dumps(head) + b"\n"
+        # Splice the upstream JSON in as-is instead of re-encoding it; it is still parsed once, so a
+        # truncated or malformed answer can't corrupt the stream. Raw line breaks can only be
+        # whitespace in valid JSON (inside strings they are escaped).
+        body = body.strip()
+        if body:
+            try:
+                fastjson.loads(body)
+            except ValueError:
+                head["error"] = "Upstream answered invalid JSON"
+                head["body"] = body.decode("utf-8", "replace")
+                return fastjson.dumps(head) + b"\n"
+        body = body.replace(b"\r", b" ").replace(b"\n", b" ")
+        return fastjson.dumps(head)[:-1] + b',"data":' + (body or b"null") + b"}\n"
+
+    for answer in asyncio.as_completed([one(supplier) for supplier in suppliers]):
+        yield await answer
+
+
+# Bakuun answers a results call made before the search has finished with a pending status
+def _results_pending(payload: Any) -> bool:
+    if isinstance(payload, dict):
+        status = payload.get("status", payload.get("Status"))
+        return isinstance(status, str) and status.lower() in config.TOKEN_PENDING_STATUSES
+    return False
+
+
+# GET a search token's results. With wait > 0 this long-polls: the upstream is asked again every
+# TOKEN_POLL_INTERVAL seconds until the results are ready or the wait runs out, so clients make
+# one slow call instead of a tight polling loop. Each answer is parsed once.
+async def token_results(route: str, name: str, path: str, body: Any, wait: float = 0) -> Any:
+    client = upstream_clients.get(name)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0), config.TOKEN_POLL_MAX_WAIT)
+    while True:
+        response = await call_upstream(
+            name,
+            lambda: client.request(
+                "GET", path, content=fastjson.dumps(body), headers={"Content-Type": "application/json", "Accept": "application/json"}
+            ),
+            lambda response: response.status_code,
+            route=route,
+            idempotent=True,
+        )
+        last_attempt = loop.time() + config.TOKEN_POLL_INTERVAL >= deadline
+        # 202 / 204: accepted but nothing to show yet
+        if last_attempt or response.status_code not in (202, 204):
+            payload = fastjson.loads(response.content)
+            if last_attempt or not _results_pending(payload):
+                return payload
+        await asyncio.sleep(config.TOKEN_POLL_INTERVAL)